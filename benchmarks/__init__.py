@@ -0,0 +1,136 @@
+
+import sys
+import time
+import random
+import platform
+import json
+from typing import List, Dict
+
+
+class BenchmarkSkipped(Exception):
+    """
+    Raise this in the setup of a benchmark if it cannot run here, e.g. without a display.
+    """
+
+
+class Benchmark:
+    def __init__(self, name, func, setup=None, number=1, repeat=5):
+        """
+        :param str name: e.g. "load/robot.sce"
+        :param ()->None func: the code to measure
+        :param (()->None)|None setup: called before every repeat, not measured
+        :param int number: how often func is called per repeat
+        :param int repeat: how often to repeat the measurement
+        """
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.number = number
+        self.repeat = repeat
+
+    def run(self, repeat=None):
+        """
+        :param int|None repeat: overwrites self.repeat
+        :return: result dict, with times per call of func in seconds
+        :rtype: dict[str]
+        """
+        times = []  # type: List[float]
+        for _ in range(repeat or self.repeat):
+            random.seed(42)
+            if self.setup:
+                self.setup()
+            start_time = time.perf_counter()
+            for _ in range(self.number):
+                self.func()
+            times.append((time.perf_counter() - start_time) / self.number)
+        times.sort()
+        return {
+            "median": times[len(times) // 2],
+            "min": times[0],
+            "max": times[-1],
+            "mean": sum(times) / len(times),
+            "number": self.number,
+            "repeat": len(times)}
+
+
+def get_all_benchmarks():
+    """
+    :rtype: list[Benchmark]
+    """
+    from . import bench_world, bench_gfx
+    return bench_world.get_benchmarks() + bench_gfx.get_benchmarks()
+
+
+def get_meta_info():
+    """
+    :rtype: dict[str]
+    """
+    import numpy
+    return {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine()}
+
+
+def run_benchmarks(benchmarks, repeat=None, verbose=True):
+    """
+    :param list[Benchmark] benchmarks:
+    :param int|None repeat:
+    :param bool verbose:
+    :return: dict with "meta", "results" and "skipped"
+    :rtype: dict[str]
+    """
+    results = {}  # type: Dict[str,Dict[str]]
+    skipped = {}  # type: Dict[str,str]
+    for benchmark in benchmarks:
+        try:
+            results[benchmark.name] = benchmark.run(repeat=repeat)
+        except BenchmarkSkipped as exc:
+            skipped[benchmark.name] = str(exc)
+            if verbose:
+                print("%-40s skipped: %s" % (benchmark.name, exc))
+            continue
+        if verbose:
+            print("%-40s %10.3f ms" % (benchmark.name, results[benchmark.name]["median"] * 1000.))
+    return {"meta": get_meta_info(), "results": results, "skipped": skipped}
+
+
+def compare_to_baseline(report, baseline, threshold=0.2, verbose=True):
+    """
+    :param dict[str] report: from run_benchmarks
+    :param dict[str] baseline: from run_benchmarks, e.g. an older stored report
+    :param float threshold: relative slowdown of the median which counts as regression
+    :return: names of the regressed benchmarks
+    :rtype: list[str]
+    """
+    regressions = []
+    for name, result in sorted(report["results"].items()):
+        if name not in baseline["results"]:
+            continue
+        ratio = result["median"] / max(baseline["results"][name]["median"], 1e-12)
+        if ratio > 1. + threshold:
+            regressions.append(name)
+        if verbose:
+            print("%-40s %6.2fx %s" % (name, ratio, "REGRESSION" if ratio > 1. + threshold else ""))
+    return regressions
+
+
+def load_report(filename):
+    """
+    :param str filename:
+    :rtype: dict[str]
+    """
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_report(filename, report):
+    """
+    :param str filename:
+    :param dict[str] report:
+    """
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
@@ -0,0 +1,45 @@
+
+"""
+Runs the benchmarks, e.g.::
+
+    python -m benchmarks --output bench.json
+    python -m benchmarks --baseline bench.json --filter tick/
+
+The exit code is 1 if some benchmark got slower than the baseline by more than the threshold.
+"""
+
+import sys
+from . import get_all_benchmarks, run_benchmarks, compare_to_baseline, load_report, save_report
+
+
+def main():
+    import argparse
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--filter", help="only run benchmarks where the name contains this")
+    arg_parser.add_argument("--repeat", type=int, help="overwrites the number of repetitions of each benchmark")
+    arg_parser.add_argument("--output", help="write the results as JSON to this file")
+    arg_parser.add_argument("--baseline", help="JSON file from an earlier run with --output, to compare to")
+    arg_parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown counted as regression")
+    arg_parser.add_argument("--list", action="store_true", help="only list the benchmarks")
+    args = arg_parser.parse_args()
+
+    benchmarks = get_all_benchmarks()
+    if args.filter:
+        benchmarks = [benchmark for benchmark in benchmarks if args.filter in benchmark.name]
+    if args.list:
+        for benchmark in benchmarks:
+            print(benchmark.name)
+        return
+    report = run_benchmarks(benchmarks, repeat=args.repeat)
+    if args.output:
+        save_report(args.output, report)
+    if args.baseline:
+        print("Compared to baseline %s:" % args.baseline)
+        regressions = compare_to_baseline(report, load_report(args.baseline), threshold=args.threshold)
+        if regressions:
+            print("Regressions: %s" % ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+
+"""
+Benchmarks of the drawing and the menus.
+These need arcade and a display. The window is hidden while measuring.
+"""
+
+from . import Benchmark, BenchmarkSkipped
+
+
+_app = None
+
+
+def get_app():
+    """
+    :return: the game.app.App instance, created on the first call
+    :rtype: game.app.App
+    """
+    global _app
+    if _app:
+        return _app
+    try:
+        import arcade  # noqa
+    except ImportError as exc:
+        raise BenchmarkSkipped("arcade not available: %s" % exc)
+    from game.app import App
+    try:
+        _app = App()
+    except Exception as exc:  # e.g. no display
+        raise BenchmarkSkipped("cannot open window: %s: %s" % (type(exc).__name__, exc))
+    _app.window.set_visible(False)
+    return _app
+
+
+def _make_draw_benchmark():
+    def setup():
+        app = get_app()
+        app.game.load("robot.sce")
+        while app.game.window_stack.is_visible():
+            app.game.window_stack.stack[-1].close()
+
+    def draw():
+        from pyglet import gl
+        app = get_app()
+        app.window.switch_to()
+        app.window.on_draw()
+        gl.glFinish()  # include the time the GPU needs
+
+    return Benchmark(name="gfx/Game.draw", func=draw, setup=setup, number=50)
+
+
+def _make_menu_benchmarks():
+    def setup():
+        get_app()
+
+    def main_menu():
+        from game.game import MainMenu
+        MainMenu(game=get_app().game)
+
+    def help_menu():
+        from game.gui import HelpMenu
+        HelpMenu(window_stack=get_app().game.window_stack)
+
+    return [
+        Benchmark(name="gfx/MainMenu", func=main_menu, setup=setup, number=10),
+        Benchmark(name="gfx/HelpMenu", func=help_menu, setup=setup, number=10)]
+
+
+def get_benchmarks():
+    """
+    :rtype: list[Benchmark]
+    """
+    return [_make_draw_benchmark()] + _make_menu_benchmarks()
@@ -0,0 +1,224 @@
+
+"""
+Headless benchmarks of the game logic, see game.world.
+"""
+
+import os
+import atexit
+import shutil
+import tempfile
+import numpy
+from game import world
+from game.world import Simulation, Entity, is_allowed_together, find_game_file
+from game.worldfile import read_world_file, write_world_file, BinaryFileExt, DeltaFileExt
+from game.replay import Recording, RecordingFileExt, replay
+from . import Benchmark, BenchmarkSkipped
+
+
+RecordingsDir = os.path.dirname(os.path.abspath(__file__)) + "/recordings"
+
+
+def get_game_files():
+    """
+    :return: all files in data/game, e.g. ["altewelt.sce", ...]
+    :rtype: list[str]
+    """
+    return sorted(os.listdir(world.GAME_DATA_DIR))
+
+
+def get_recording_files():
+    """
+    :return: all recorded sessions in benchmarks/recordings, see game.replay
+    :rtype: list[str]
+    """
+    return sorted(fn for fn in os.listdir(RecordingsDir) if fn.endswith("." + RecordingFileExt))
+
+
+def get_robot_room_idx(data):
+    """
+    :param game.worldfile.WorldData data:
+    :return: idx of the room with the most robots
+    :rtype: int
+    """
+    robot_ids = [world.TILE_IDS[name] for name in world.ROBOT_PICS]
+    counts = numpy.isin(data.tiles, robot_ids).reshape((data.tiles.shape[0], -1)).sum(axis=1)
+    return int(numpy.argmax(counts))
+
+
+class TempDir:
+    def __init__(self):
+        self.path = None  # type: str
+        self.count = 0
+
+    def reset(self):
+        self.cleanup()
+        self.path = tempfile.mkdtemp(prefix="pyoverheadgame-bench-")
+        self.count = 0
+
+    def cleanup(self):
+        if self.path:
+            shutil.rmtree(self.path)
+            self.path = None
+
+    def new_filename(self, ext):
+        """
+        :param str ext: e.g. "spi"
+        :return: filename without directory
+        :rtype: str
+        """
+        self.count += 1
+        return "bench%i.%s" % (self.count, ext)
+
+
+def _make_load_benchmark(filename):
+    sim = Simulation()
+    return Benchmark(
+        name="load/%s" % filename,
+        func=lambda: sim.load(filename),
+        number=10)
+
+
+def _make_load_binary_benchmark(filename, tmp_dir):
+    sim = Simulation()
+    binary_filename = "%s/%s.%s" % (tmp_dir.path, filename.rsplit(".", 1)[0], BinaryFileExt)
+
+    def setup():
+        if not os.path.exists(binary_filename):
+            write_world_file(binary_filename, read_world_file(find_game_file(filename)))
+
+    return Benchmark(
+        name="load.%s/%s" % (BinaryFileExt, filename),
+        func=lambda: sim.load(binary_filename),
+        setup=setup, number=10)
+
+
+def _make_read_benchmarks(filename, tmp_dir):
+    """
+    The parts of loading: reading the file (for .spb only a view into the mmap),
+    and World.set_data(), which copies the tiles into the world and creates the entities.
+    """
+    full_filename = find_game_file(filename)
+    binary_filename = "%s/%s.read.%s" % (tmp_dir.path, filename.rsplit(".", 1)[0], BinaryFileExt)
+    sim = Simulation()
+    data = read_world_file(full_filename)
+
+    def setup_binary():
+        if not os.path.exists(binary_filename):
+            write_world_file(binary_filename, data)
+
+    return [
+        Benchmark(
+            name="read/%s" % filename,
+            func=lambda: read_world_file(full_filename), number=10),
+        Benchmark(
+            name="read.%s/%s" % (BinaryFileExt, filename),
+            func=lambda: read_world_file(binary_filename), setup=setup_binary, number=10),
+        Benchmark(
+            name="set_data/%s" % filename,
+            func=lambda: sim.world.set_data(data), number=10)]
+
+
+def _make_save_benchmark(filename, ext, tmp_dir):
+    sim = Simulation()
+
+    def setup():
+        sim.load(filename)
+        if not sim.human_player and ext != "sce":
+            raise BenchmarkSkipped("no human player")
+
+    return Benchmark(
+        name="save.%s/%s" % (ext, filename),
+        func=lambda: sim.world.save(tmp_dir.new_filename(ext), directory=tmp_dir.path),
+        setup=setup, number=10)
+
+
+def _make_tick_benchmark(filename):
+    sim = Simulation()
+    data = read_world_file(find_game_file(filename))
+    room_idx = get_robot_room_idx(data)
+
+    def setup():
+        sim.world.set_data(data)
+        sim._load_post_init()
+        if not sim.human_player:
+            raise BenchmarkSkipped("no human player")
+        sim.cur_room = sim.world.rooms[room_idx]
+        sim.cur_room.materialize()
+
+    return Benchmark(
+        name="tick/%s" % filename,
+        func=sim.do_computer_interval,
+        setup=setup, number=50)
+
+
+def _make_replay_benchmark(filename):
+    recording = Recording.load("%s/%s" % (RecordingsDir, filename))
+
+    def run():
+        sim, _ = replay(recording)
+        assert sim.get_state_hash() == recording.header["state_hash"], "replay mismatch: %s" % filename
+
+    return Benchmark(name="replay/%s" % filename, func=run, repeat=3)
+
+
+def _make_entity_benchmarks():
+    sim = Simulation()
+    room = sim.world.rooms[0]
+    center = numpy.array((room.width // 2, room.height // 2))
+    left, right = numpy.array((-1, 0)), numpy.array((1, 0))
+
+    def setup():
+        sim.load_empty()
+        room.get_place(center).set_entity(Entity(room=room, room_coord=center, name=world.PLAYER_PIC))
+        sim._load_post_init()
+
+    def move():
+        sim.human_player.move(right)
+        sim.human_player.move(left)
+
+    def collect_score():
+        coord = center + right
+        room.get_place(coord).set_entity(Entity(room=room, room_coord=coord, name=world.SCORES_PICS[0]))
+        move()
+
+    robot_room_sim = Simulation()
+    stacks = []
+
+    def setup_stacks():
+        robot_room_sim.load("robot.sce")
+        data = robot_room_sim.world.get_data(with_game_state=False)
+        robot_room = robot_room_sim.world.rooms[get_robot_room_idx(data)]
+        robot = robot_room.find_robots()[0]
+        stacks[:] = [place.entities + [robot] for place in robot_room.places]
+
+    def allowed_together():
+        for entities in stacks:
+            is_allowed_together(entities)
+
+    return [
+        Benchmark(name="entity/move", func=move, setup=setup, number=1000),
+        Benchmark(name="entity/on_joined_together", func=collect_score, setup=setup, number=1000),
+        Benchmark(name="entity/is_allowed_together", func=allowed_together, setup=setup_stacks, number=20)]
+
+
+def get_benchmarks(tmp_dir=None):
+    """
+    :param TempDir|None tmp_dir: for the save benchmarks
+    :rtype: list[Benchmark]
+    """
+    if not tmp_dir:
+        tmp_dir = TempDir()
+        tmp_dir.reset()
+        atexit.register(tmp_dir.cleanup)
+    benchmarks = []
+    for filename in get_game_files():
+        benchmarks.append(_make_load_benchmark(filename))
+        benchmarks.append(_make_load_binary_benchmark(filename, tmp_dir))
+        benchmarks.extend(_make_read_benchmarks(filename, tmp_dir))
+        for ext in ("spi", BinaryFileExt, DeltaFileExt):
+            benchmarks.append(_make_save_benchmark(filename, ext, tmp_dir))
+        benchmarks.append(_make_tick_benchmark(filename))
+    benchmarks.extend(_make_entity_benchmarks())
+    for filename in get_recording_files():
+        benchmarks.append(_make_replay_benchmark(filename))
+    return benchmarks
@@ -1,7 +1,10 @@
 
 import arcade
-import pyglet.image
-from . import game
+import time
+from typing import List
+from . import world
+from . import startup
+from .perf import stats as perf_stats
 from .game import Game
 from .data import GFX_DIR
 
@@ -14,9 +17,12 @@ class App:
         global app
         assert not app
         app = self
-        self.window = MainWindow()
-        self.game = Game()
-        self.game.init()
+        with startup.phase("MainWindow"):
+            self.window = MainWindow()
+        with startup.phase("Game"):
+            self.game = Game()
+        with startup.phase("Game.init"):
+            self.game.init()
 
     # noinspection PyMethodMayBeStatic
     def main(self):
@@ -43,24 +49,62 @@ class MainWindow(arcade.Window):
 
     KeyRepeatDelayTime = 0.2
     KeyRepeatTime = 0.05
-    KeyRepeatIgnoreKeys = (arcade.key.RETURN,)  # can lead to unexpected behavior
+    KeyRepeatMaxCatchUp = 3  # max number of key repeats in one update, e.g. after the window was stalled
+    KeyRepeatIgnoreKeys = (
+        arcade.key.RETURN, arcade.key.F3, arcade.key.P, arcade.key.F,
+        arcade.key.F5, arcade.key.F9, arcade.key.R)  # unexpected otherwise
+    PerfOverlayKey = arcade.key.F3
 
     def __init__(self):
         self.entity_pixel_size = 30
-        width = self.entity_pixel_size * (game.ROOM_WIDTH + 1 + game.KNAPSACK_WIDTH)
-        height = self.entity_pixel_size * (game.ROOM_HEIGHT + 1)
+        width = self.entity_pixel_size * (world.ROOM_WIDTH + 1 + world.KNAPSACK_WIDTH)
+        height = self.entity_pixel_size * (world.ROOM_HEIGHT + 1)
         super(MainWindow, self).__init__(
             width=width, height=height, title="PyOverheadGame!")
         self.key_downs = {}  # key int idx -> delta time
+        self.last_draw_time = None  # type: float
+        self.perf_labels = []  # type: List[arcade.pyglet.text.Label]
+        self.perf_labels_time = None  # type: float
+        import pyglet.image
         self.set_icon(pyglet.image.load("%s/robot.png" % GFX_DIR))
 
     def on_draw(self):
         """
         Called every frame for drawing.
         """
-        arcade.start_render()
-        arcade.set_background_color(arcade.color.BABY_BLUE)
-        app.game.draw()
+        if perf_stats.enabled:
+            now = time.perf_counter()
+            if self.last_draw_time is not None:
+                perf_stats.add_sample("frame interval", now - self.last_draw_time)
+            self.last_draw_time = now
+        with perf_stats.timer("MainWindow.on_draw"):
+            arcade.start_render()
+            arcade.set_background_color(arcade.color.BABY_BLUE)
+            app.game.draw()
+        if perf_stats.enabled:
+            self.draw_perf_overlay()
+
+    def draw_perf_overlay(self):
+        """
+        Draws the perf.stats summary in the top left corner.
+        The labels are only recreated when the rates are updated, i.e. once per second.
+        """
+        perf_stats.update_rates()
+        if self.perf_labels_time != perf_stats.rate_start_time:
+            self.perf_labels_time = perf_stats.rate_start_time
+            self.perf_labels = [
+                arcade.create_text(
+                    line, color=arcade.color.WHITE, font_size=9, font_name=("Courier New", "Courier"))
+                for line in perf_stats.get_summary_lines()]
+        line_height = 13
+        width = max([label.content_width for label in self.perf_labels] + [0]) + 10
+        height = line_height * len(self.perf_labels) + 10
+        arcade.draw_rectangle_filled(
+            color=(0, 0, 0, 180),
+            center_x=width // 2, center_y=self.height - height // 2,
+            width=width, height=height)
+        for i, label in enumerate(self.perf_labels):
+            arcade.render_text(label, start_x=5, start_y=self.height - 5 - line_height * (i + 1))
 
     # Does not work?
     # def on_resize(self, width, height):
@@ -73,13 +117,16 @@ class MainWindow(arcade.Window):
 
         :param float delta_time: how much time passed
         """
-        app.game.update(delta_time=delta_time)
+        with perf_stats.timer("MainWindow.update"):
+            app.game.update(delta_time=delta_time)
         for key, t in sorted(self.key_downs.items()):
             t += delta_time
-            while t > self.KeyRepeatDelayTime:
+            count = 0
+            while t > self.KeyRepeatDelayTime and count < self.KeyRepeatMaxCatchUp:
                 t -= self.KeyRepeatTime
                 self.on_key_press(key=key, modifiers=0)
-            self.key_downs[key] = t
+                count += 1
+            self.key_downs[key] = min(t, self.KeyRepeatDelayTime)
 
     def on_key_press(self, key, modifiers):
         """
@@ -99,6 +146,30 @@ class MainWindow(arcade.Window):
             app.game.on_key_return()
         elif key == arcade.key.ESCAPE:
             app.game.on_key_escape()
+        elif key == self.PerfOverlayKey:
+            perf_stats.toggle()
+        elif key == arcade.key.P and not app.game.menu_is_visible:
+            app.game.switch_pause()
+        elif key == arcade.key.F and not app.game.menu_is_visible:
+            app.game.switch_speed()
+        elif key == arcade.key.F5 and not app.game.menu_is_visible and not app.game.edit_mode:
+            app.game.quicksave()
+        elif key == arcade.key.F9 and not app.game.menu_is_visible and not app.game.edit_mode:
+            app.game.quickload()
+        elif key == arcade.key.R and not app.game.menu_is_visible and not app.game.edit_mode:
+            app.game.retry_room()
+        elif key == arcade.key.Z and modifiers & arcade.key.MOD_CTRL and app.game.edit_mode \
+                and not app.game.menu_is_visible:
+            app.game.undo_edit()
+        elif key == arcade.key.Y and modifiers & arcade.key.MOD_CTRL and app.game.edit_mode \
+                and not app.game.menu_is_visible:
+            app.game.redo_edit()
+        elif key == arcade.key.C and modifiers & arcade.key.MOD_CTRL and app.game.edit_mode \
+                and not app.game.menu_is_visible:
+            app.game.copy_edit_region()
+        elif key == arcade.key.V and modifiers & arcade.key.MOD_CTRL and app.game.edit_mode \
+                and not app.game.menu_is_visible:
+            app.game.paste_edit_clipboard()
         if key not in self.KeyRepeatIgnoreKeys:
             self.key_downs.setdefault(key, 0.0)
 
@@ -120,7 +191,44 @@ class MainWindow(arcade.Window):
     def on_mouse_press(self, x: float, y: float, button: int, modifiers: int):
         app.game.on_mouse_press(x, self.height - y, button)
 
+    def on_mouse_drag(self, x: float, y: float, dx: float, dy: float, buttons: int, modifiers: int):
+        app.game.on_mouse_drag(x, self.height - y)
+
+    def on_mouse_release(self, x: float, y: float, button: int, modifiers: int):
+        app.game.on_mouse_release(x, self.height - y, button)
+
 
 def main():
     """ Main method """
-    App().main()
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="PyOverheadGame")
+    arg_parser.add_argument(
+        "--profile", action="store_true",
+        help="run the sampling profiler for the whole session, see game/profiler.py")
+    arg_parser.add_argument(
+        "--save-store", action="store_true",
+        help="save into the SQLite save store instead of .spi files, see game/savestore.py")
+    arg_parser.add_argument(
+        startup.StartupProfileArg, nargs="?", const="startup-profile.json", metavar="FILE",
+        help="measure the startup (phases and imports), write it as JSON to FILE and exit. see game/startup.py")
+    arg_parser.add_argument(
+        "--startup-budget", type=float, metavar="SECS",
+        help="with %s: exit with error if the startup takes longer" % startup.StartupProfileArg)
+    args = arg_parser.parse_args()
+    if args.save_store:
+        Game.UseSaveStore = True
+    if args.startup_profile:
+        startup.start()  # if not via main.py. then the imports so far are not measured
+        App()
+        if not startup.profile.write(args.startup_profile, budget=args.startup_budget):
+            import sys
+            sys.exit(1)
+        return
+    from . import profiler
+    if args.profile:
+        profiler.start_profiler()
+    try:
+        App().main()
+    finally:
+        if args.profile and profiler.is_profiling():
+            print("Profile written to:", profiler.stop_profiler())
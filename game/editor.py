@@ -0,0 +1,439 @@
+
+"""
+Undo/redo history of the level editor (Game.edit_mode).
+
+Every change of a place is recorded as (room idx, place idx, old tile ids, new tile ids),
+with the tile id stacks as in Room.tiles. The changes are grouped into steps, e.g. all places
+of one drag-painting stroke are one step, and painting the same place again within the step is coalesced.
+A finished step is stored as a few small NumPy arrays. "Reset world" only records the places which were not empty,
+and no new tiles at all, so this is much smaller than a copy of the world.
+The oldest steps are dropped when the history gets bigger than EditHistoryMaxBytes.
+
+The bulk operations (fill, flood fill, paste, mirror) compute the new tiles of the whole room at once,
+and apply them as one step via set_room_tiles(). In a materialized room, only the changed places
+are replaced, such that all other entities (e.g. the human player with its scores and knapsack) stay.
+For more than EditNotifyMaxNumPlaces places, the room observers (e.g. the renderer) are not notified
+about each place, but get a single RoomObserver.on_room_reset() at the end.
+"""
+
+import numpy
+from collections import deque
+from typing import Dict, List, Tuple, Optional
+from .world import World, Room, Entity, TILE_DTYPE, PLACE_STACK_DEPTH, PLAYER_PIC
+
+
+EditHistoryMaxBytes = 4 * 1024 * 1024
+# Approximate per-step overhead (Python objects) for the memory budget.
+EditStepOverheadBytes = 500
+# Up to this number of changed places in a room, the room observers get notified per place.
+EditNotifyMaxNumPlaces = 16
+
+
+def get_region_slices(coord1, coord2):
+    """
+    :param (int,int)|numpy.ndarray coord1: one corner (x,y) of the region, inclusive
+    :param (int,int)|numpy.ndarray coord2: the opposite corner, inclusive
+    :return: (y slice, x slice), for room tiles in the shape (height, width, depth), see get_tiles_grid()
+    :rtype: (slice, slice)
+    """
+    x1, y1 = numpy.minimum(coord1, coord2).tolist()
+    x2, y2 = numpy.maximum(coord1, coord2).tolist()
+    return slice(y1, y2 + 1), slice(x1, x2 + 1)
+
+
+def get_tiles_grid(room, tiles):
+    """
+    :param Room room:
+    :param numpy.ndarray tiles: like room.tiles, i.e. (width * height, PLACE_STACK_DEPTH)
+    :return: view in the shape (height, width, PLACE_STACK_DEPTH)
+    :rtype: numpy.ndarray
+    """
+    return tiles.reshape((room.height, room.width, tiles.shape[-1]))
+
+
+def make_stack(tile_ids):
+    """
+    :param list[int]|numpy.ndarray tile_ids: bottom first. can be shorter than PLACE_STACK_DEPTH, or empty
+    :rtype: numpy.ndarray
+    """
+    stack = numpy.zeros((PLACE_STACK_DEPTH,), dtype=TILE_DTYPE)
+    stack[:len(tile_ids)] = tile_ids
+    return stack
+
+
+def copy_region(room, coord1, coord2):
+    """
+    :param Room room:
+    :param (int,int)|numpy.ndarray coord1: see get_region_slices()
+    :param (int,int)|numpy.ndarray coord2:
+    :return: copy of the tiles, in the shape (height, width, PLACE_STACK_DEPTH). see EditHistory.paste()
+    :rtype: numpy.ndarray
+    """
+    return get_tiles_grid(room, room.tiles)[get_region_slices(coord1, coord2)].copy()
+
+
+def _trim_depth(tiles):
+    """
+    :param numpy.ndarray tiles: (num places, PLACE_STACK_DEPTH)
+    :return: without the stack levels which are empty in all places. mostly only 1 or 2 are used
+    :rtype: numpy.ndarray
+    """
+    depth = int(numpy.count_nonzero(tiles.any(axis=0)))  # the stacks are filled from the bottom
+    return numpy.ascontiguousarray(tiles[:, :max(depth, 1)], dtype=TILE_DTYPE)
+
+
+class EditStep:
+    """
+    Changes of places which are undone and redone together.
+    """
+
+    def __init__(self, name):
+        """
+        :param str name: e.g. "Paint"
+        """
+        self.name = name
+        # (room idx, place idx) -> (old tiles, new tiles). only while the step is open, see finish()
+        self.changes = {}  # type: Dict[Tuple[int,int],Tuple[numpy.ndarray,numpy.ndarray]]
+        self.room_idxs = None  # type: Optional[numpy.ndarray]
+        self.place_idxs = None  # type: Optional[numpy.ndarray]
+        self.old_tiles = None  # type: Optional[numpy.ndarray]  # (num changes, depth), see _trim_depth()
+        self.new_tiles = None  # type: Optional[numpy.ndarray]  # like old_tiles, or None if all are empty
+        self.old_diamonds = None  # type: Optional[List[bool]]  # if the step changes World.diamonds_activated
+        self.new_diamonds = None  # type: Optional[List[bool]]
+        # The human player before the step. Its state is carried over if undo/redo recreates it.
+        self.human = None  # type: Optional[Entity]
+
+    def add_change(self, room_idx, place_idx, old_tiles, new_tiles):
+        """
+        :param int room_idx:
+        :param int place_idx:
+        :param numpy.ndarray old_tiles: (PLACE_STACK_DEPTH,)
+        :param numpy.ndarray new_tiles: (PLACE_STACK_DEPTH,)
+        """
+        key = (room_idx, place_idx)
+        if key in self.changes:  # coalesce, e.g. painted twice within one stroke
+            old_tiles = self.changes[key][0]
+        self.changes[key] = (old_tiles, new_tiles)
+
+    def add_bulk_changes(self, room_idxs, place_idxs, old_tiles, new_tiles=None):
+        """
+        Like add_change() for many places at once. Only for a new step, i.e. nothing to coalesce.
+
+        :param numpy.ndarray room_idxs:
+        :param numpy.ndarray place_idxs:
+        :param numpy.ndarray old_tiles: (num changes, PLACE_STACK_DEPTH)
+        :param numpy.ndarray|None new_tiles: like old_tiles, or None if all are empty
+        """
+        assert not self.changes and self.room_idxs is None
+        self.room_idxs = room_idxs.astype(numpy.uint8)
+        self.place_idxs = place_idxs.astype(numpy.uint16)
+        self.old_tiles = _trim_depth(old_tiles)
+        self.new_tiles = _trim_depth(new_tiles) if new_tiles is not None and new_tiles.any() else None
+
+    def finish(self):
+        """
+        Converts the changes into the compact arrays.
+        """
+        if self.room_idxs is not None:
+            return
+        keys = [key for (key, (old, new)) in self.changes.items() if not numpy.array_equal(old, new)]
+        self.room_idxs = numpy.array([key[0] for key in keys], dtype=numpy.uint8)
+        self.place_idxs = numpy.array([key[1] for key in keys], dtype=numpy.uint16)
+        self.old_tiles = _trim_depth(numpy.array(
+            [self.changes[key][0] for key in keys], dtype=TILE_DTYPE).reshape((-1, PLACE_STACK_DEPTH)))
+        new_tiles = numpy.array(
+            [self.changes[key][1] for key in keys], dtype=TILE_DTYPE).reshape((-1, PLACE_STACK_DEPTH))
+        self.new_tiles = _trim_depth(new_tiles) if new_tiles.any() else None
+        self.changes = {}
+
+    def is_empty(self):
+        return len(self.room_idxs) == 0 and self.old_diamonds == self.new_diamonds
+
+    def get_num_bytes(self):
+        """
+        :return: approximate memory usage
+        :rtype: int
+        """
+        n = self.room_idxs.nbytes + self.place_idxs.nbytes + self.old_tiles.nbytes
+        if self.new_tiles is not None:
+            n += self.new_tiles.nbytes
+        return n + EditStepOverheadBytes
+
+
+class EditHistory:
+    def __init__(self, world, max_bytes=EditHistoryMaxBytes):
+        """
+        :param World world:
+        :param int max_bytes: memory budget, see EditStep.get_num_bytes()
+        """
+        self.world = world
+        self.max_bytes = max_bytes
+        self.undo_steps = []  # type: List[EditStep]  # oldest first
+        self.redo_steps = []  # type: List[EditStep]  # most recently undone last
+        self.cur_step = None  # type: Optional[EditStep]  # open step, see begin_step()
+        self.num_bytes = 0  # of undo_steps and redo_steps
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.cur_step = None
+        self.num_bytes = 0
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def begin_step(self, name):
+        """
+        All the following changes until end_step() are one step, e.g. one drag-painting stroke.
+
+        :param str name:
+        """
+        self.end_step()
+        self.cur_step = EditStep(name)
+        self.cur_step.human = self.world.find_human_player()
+
+    def end_step(self):
+        step, self.cur_step = self.cur_step, None
+        if not step:
+            return
+        step.finish()
+        if step.is_empty():
+            return
+        for redo_step in self.redo_steps:
+            self.num_bytes -= redo_step.get_num_bytes()
+        self.redo_steps.clear()
+        self.undo_steps.append(step)
+        self.num_bytes += step.get_num_bytes()
+        # Always keep the last step, even if it alone is over the budget.
+        while self.num_bytes > self.max_bytes and len(self.undo_steps) > 1:
+            self.num_bytes -= self.undo_steps.pop(0).get_num_bytes()
+
+    def set_place_tiles(self, room, place_idx, tiles):
+        """
+        Replaces the entities of the place, without any interaction, and records it in the current step.
+        Without an open step, this is a step on its own.
+
+        :param Room room: one of world.rooms
+        :param int place_idx:
+        :param list[int]|numpy.ndarray tiles: tile ids, bottom first. can be shorter than PLACE_STACK_DEPTH
+        """
+        new_tiles = make_stack(tiles)
+        old_tiles = room.tiles[place_idx].copy()
+        if numpy.array_equal(old_tiles, new_tiles):
+            return
+        own_step = not self.cur_step
+        if own_step:
+            self.begin_step("Edit")
+        self.cur_step.add_change(room.idx, place_idx, old_tiles, new_tiles)
+        room.places[place_idx].set_tiles(new_tiles)
+        self._update_king()
+        if own_step:
+            self.end_step()
+
+    def set_room_tiles(self, room, tiles, name):
+        """
+        Replaces the tiles of the room, without any interaction, as one step on its own.
+
+        :param Room room: one of world.rooms
+        :param numpy.ndarray tiles: like room.tiles
+        :param str name: of the step
+        :return: number of changed places
+        :rtype: int
+        """
+        self.end_step()
+        place_idxs = numpy.flatnonzero((tiles != room.tiles).any(axis=1))
+        if len(place_idxs) == 0:
+            return 0
+        self.begin_step(name)
+        human = self.cur_step.human
+        self.cur_step.add_bulk_changes(
+            numpy.full(len(place_idxs), room.idx), place_idxs, room.tiles[place_idxs], tiles[place_idxs])
+        self.end_step()
+        self._set_room_place_tiles(room, place_idxs, tiles[place_idxs])
+        self._carry_human_state(human)
+        self._update_king()
+        return len(place_idxs)
+
+    @staticmethod
+    def _set_room_place_tiles(room, place_idxs, tiles):
+        """
+        :param Room room:
+        :param numpy.ndarray place_idxs:
+        :param numpy.ndarray tiles: (len(place_idxs), depth)
+        """
+        if room.is_materialized():
+            # Only the changed places. Room.load_tiles() would recreate all entities, and lose their state.
+            observers = room.observers
+            notify_reset = len(place_idxs) > EditNotifyMaxNumPlaces
+            if notify_reset:
+                room.observers = []
+            try:
+                for place_idx, place_tiles in zip(place_idxs.tolist(), tiles):
+                    room.places[place_idx].set_tiles(place_tiles)
+            finally:
+                room.observers = observers
+            if notify_reset:
+                for observer in observers:
+                    observer.on_room_reset(room)
+        else:
+            new_room_tiles = room.tiles.copy()
+            new_room_tiles[place_idxs] = 0
+            new_room_tiles[place_idxs, :tiles.shape[1]] = tiles
+            room.load_tiles(new_room_tiles)
+
+    def _carry_human_state(self, human):
+        """
+        If the human player was replaced by a new entity (e.g. it was mirrored or pasted),
+        the new one gets the scores, lives and knapsack of the old one.
+
+        :param Entity|None human: the human player before the change
+        """
+        if not human or human in self.world.players_by_name[PLAYER_PIC]:
+            return
+        new_human = self.world.find_human_player()
+        if new_human:
+            new_human.scores = human.scores
+            new_human.lives = human.lives
+            new_human.knapsack = human.knapsack
+
+    def _update_king(self):
+        """
+        New king entities are immortal. Like World.set_data(), make them vulnerable if all diamonds are activated.
+        """
+        if all(self.world.diamonds_activated):
+            self.world.set_king_vulnerable()
+
+    def fill_region(self, room, coord1, coord2, tile_ids):
+        """
+        :param Room room:
+        :param (int,int)|numpy.ndarray coord1: see get_region_slices()
+        :param (int,int)|numpy.ndarray coord2:
+        :param list[int] tile_ids: for every place in the region. empty to erase
+        :return: number of changed places
+        :rtype: int
+        """
+        tiles = room.tiles.copy()
+        get_tiles_grid(room, tiles)[get_region_slices(coord1, coord2)] = make_stack(tile_ids)
+        return self.set_room_tiles(room, tiles, "Fill")
+
+    def flood_fill(self, room, coord, tile_ids):
+        """
+        Fills the place and all the connected places (not diagonal) which have the same entities,
+        e.g. the connected background.
+
+        :param Room room:
+        :param (int,int)|numpy.ndarray coord: start place
+        :param list[int] tile_ids: for every filled place. empty to erase
+        :return: number of changed places
+        :rtype: int
+        """
+        tiles = room.tiles.copy()
+        start_idx = room.coord_to_idx(coord)
+        same = (tiles == tiles[start_idx]).all(axis=1)
+        filled = [start_idx]
+        same[start_idx] = False
+        queue = deque([start_idx])
+        while queue:
+            idx = queue.popleft()
+            x, y = idx % room.width, idx // room.width
+            for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                if 0 <= nx < room.width and 0 <= ny < room.height:
+                    n_idx = ny * room.width + nx
+                    if same[n_idx]:
+                        same[n_idx] = False
+                        filled.append(n_idx)
+                        queue.append(n_idx)
+        tiles[filled] = make_stack(tile_ids)
+        return self.set_room_tiles(room, tiles, "Flood fill")
+
+    def paste(self, room, coord, region_tiles):
+        """
+        :param Room room:
+        :param (int,int)|numpy.ndarray coord: where the top left corner of the region goes
+        :param numpy.ndarray region_tiles: see copy_region(). the part outside of the room is skipped
+        :return: number of changed places
+        :rtype: int
+        """
+        x, y = numpy.asarray(coord).tolist()
+        tiles = room.tiles.copy()
+        grid = get_tiles_grid(room, tiles)[y:, x:]
+        height, width = min(grid.shape[0], region_tiles.shape[0]), min(grid.shape[1], region_tiles.shape[1])
+        grid[:height, :width] = region_tiles[:height, :width]
+        return self.set_room_tiles(room, tiles, "Paste")
+
+    def mirror_region(self, room, coord1, coord2, horizontal=True):
+        """
+        :param Room room:
+        :param (int,int)|numpy.ndarray coord1: see get_region_slices()
+        :param (int,int)|numpy.ndarray coord2:
+        :param bool horizontal: left <-> right. otherwise top <-> bottom
+        :return: number of changed places
+        :rtype: int
+        """
+        tiles = room.tiles.copy()
+        region = get_tiles_grid(room, tiles)[get_region_slices(coord1, coord2)]
+        region[...] = (region[:, ::-1] if horizontal else region[::-1]).copy()
+        return self.set_room_tiles(room, tiles, "Mirror")
+
+    def reset_world(self):
+        """
+        Like Simulation.load_empty(), as one step which can be undone.
+        """
+        self.begin_step("Reset world")
+        tiles = self.world.tiles
+        room_idxs, place_idxs = numpy.nonzero(tiles[:, :, 0])
+        self.cur_step.add_bulk_changes(room_idxs, place_idxs, tiles[room_idxs, place_idxs])
+        self.cur_step.old_diamonds = list(self.world.diamonds_activated)
+        self.cur_step.new_diamonds = [False] * len(self.world.diamonds_activated)
+        # While the step is open, Game._load_post_init() keeps the history.
+        self.world.game.load_empty()
+        self.end_step()
+
+    def undo(self):
+        """
+        :return: the undone step, or None if there is nothing to undo
+        :rtype: EditStep|None
+        """
+        self.end_step()
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        self._apply(step, step.old_tiles, step.old_diamonds)
+        self.redo_steps.append(step)
+        return step
+
+    def redo(self):
+        """
+        :return: the redone step, or None if there is nothing to redo
+        :rtype: EditStep|None
+        """
+        self.end_step()
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        self._apply(step, step.new_tiles, step.new_diamonds)
+        self.undo_steps.append(step)
+        return step
+
+    def _apply(self, step, tiles, diamonds):
+        """
+        :param EditStep step:
+        :param numpy.ndarray|None tiles: (num changes, depth), or None for all empty
+        :param list[bool]|None diamonds: World.diamonds_activated, or None to keep
+        """
+        human = self.world.find_human_player() or step.human
+        for room_idx in numpy.unique(step.room_idxs).tolist():
+            mask = step.room_idxs == room_idx
+            if tiles is None:
+                room_tiles = numpy.zeros((int(numpy.count_nonzero(mask)), 1), dtype=TILE_DTYPE)
+            else:
+                room_tiles = tiles[mask]
+            self._set_room_place_tiles(
+                self.world.rooms[room_idx], step.place_idxs[mask].astype(numpy.int64), room_tiles)
+        if diamonds is not None:
+            self.world.diamonds_activated[:] = diamonds
+        self._carry_human_state(human)
+        self._update_king()
@@ -1,7 +1,16 @@
 
 import arcade
 from arcade import Color
-from typing import List
+from collections import OrderedDict
+from typing import List, Dict, Tuple
+from .perf import stats as perf_stats
+
+
+LabelCacheMaxSize = 256
+
+# (is html, text, color, font size, width, anchor x, anchor y) -> label, least recently used first.
+# See get_text_label() and get_html_text_label().
+_label_cache = OrderedDict()  # type: Dict[Tuple,arcade.pyglet.text.Label]
 
 
 class WindowStack:
@@ -48,7 +57,7 @@ class Window:
         self.title = title
         self.title_label = None
         if title:
-            self.title_label = create_html_text(
+            self.title_label = get_html_text_label(
                 title, color=arcade.color.BLACK, anchor_y="center", font_size=20)
         self.title_step_size = self.border_size
 
@@ -118,15 +127,23 @@ class Menu(Window):
         """
         super(Menu, self).__init__(**kwargs)
         self.selected_action_index = initial_selected_action_index
+        self.label_location_map = {}
+        self.label_step_size = 5
+        self.set_actions(actions)
+
+    def set_actions(self, actions):
+        """
+        Replaces the actions, e.g. when the list of files changed.
+
+        :param list[(str,()->None)] actions:
+        """
         self.actions = actions
         self.labels = [
-            arcade.create_text(
-                act[0], color=arcade.color.BLACK, anchor_y="center", font_size=20)
+            get_text_label(act[0], color=arcade.color.BLACK, anchor_y="center", font_size=20)
             for act in actions]
-        self.label_location_map = {}
         self.label_width = max([label.content_width for label in self.labels]) + 30
         self.label_height = max([label.content_height for label in self.labels]) + 10
-        self.label_step_size = 5
+        self.selected_action_index = min(self.selected_action_index, len(actions) - 1)
 
     def get_size(self):
         height = 0
@@ -333,7 +350,7 @@ class TextInput(Window):
 
 class HelpMenu(MessageBox):
     def __init__(self, **kwargs):
-        from . import game
+        from . import world
         from .app import app
         s = app.window.entity_pixel_size
         super(HelpMenu, self).__init__(
@@ -342,30 +359,33 @@ class HelpMenu(MessageBox):
 Goal of the game: In some of the rooms, there is a king, which has to be defeated.
 The king is immortal unless you collected and activated all the diamonds at the corresponding spots.<br>
 <br>
-<img src='{game.PLAYER_PIC}.png' width={s} height={s}>, this is you.
+<img src='{world.PLAYER_PIC}.png' width={s} height={s}>, this is you.
 You can collect certain items to your knapsack, which is shown to the right.
 Press <font color='blue'>TAB</font> to switch to the knapsack and select some item.
 Press <font color='blue'>RETURN</font> to activate some item.
+Press <font color='blue'>P</font> to pause and <font color='blue'>F</font> to fast-forward the game.
+Press <font color='blue'>F5</font> to quicksave and <font color='blue'>F9</font> to quickload,
+or <font color='blue'>R</font> to retry the current room.
 <br>
-<img src='{game.ROBOT_PICS[1]}.png' width={s} height={s}> is a robot which wants to kill you.
+<img src='{world.ROBOT_PICS[1]}.png' width={s} height={s}> is a robot which wants to kill you.
 But you are lucky that it is kind of stupid.
-<img src='{game.KING_PIC}.png' width={s} height={s}>, this is the king.
+<img src='{world.KING_PIC}.png' width={s} height={s}>, this is the king.
 <br>
-Anything which runs into the electric wall <img src='{game.ELECTRIC_WALL_PIC}.png' width={s} height={s}> will die.
+Anything which runs into the electric wall <img src='{world.ELECTRIC_WALL_PIC}.png' width={s} height={s}> will die.
 <br>
-Collect the keys <img src='{game.KEY_PICS[2]}.png' width={s} height={s}> to be able to pass the doors
-<img src='{game.DOOR_PICS[2]}.png' width={s} height={s}>.
+Collect the keys <img src='{world.KEY_PICS[2]}.png' width={s} height={s}> to be able to pass the doors
+<img src='{world.DOOR_PICS[2]}.png' width={s} height={s}>.
 Doors at the edge are closed when there are still robots alive in the room.
 <br>
-Collect the chemical <img src='{game.BURN_PIC}.png' width={s} height={s}> and activate nearby
-a normal wall <img src='{game.SOFT_WALL_PIC}.png' width={s} height={s}> to burn it away.
+Collect the chemical <img src='{world.BURN_PIC}.png' width={s} height={s}> and activate nearby
+a normal wall <img src='{world.SOFT_WALL_PIC}.png' width={s} height={s}> to burn it away.
 <br>
-If you get to the kill switch <img src='{game.KILL_PIC}.png' width={s} height={s}>,
+If you get to the kill switch <img src='{world.KILL_PIC}.png' width={s} height={s}>,
 all robots in the room will get killed immediately.
 <br>
-The elixir <img src='{game.GET_LIVE_PIC}.png' width={s} height={s}> can be used to give you an additional life.
-Collect the diamonds <img src='{game.DIAMOND_PICS[0]}.png' width={s} height={s}> and activate nearby the
-corresponding spot <img src='{game.CODE_PICS[0]}.png' width={s} height={s}>.
+The elixir <img src='{world.GET_LIVE_PIC}.png' width={s} height={s}> can be used to give you an additional life.
+Collect the diamonds <img src='{world.DIAMOND_PICS[0]}.png' width={s} height={s}> and activate nearby the
+corresponding spot <img src='{world.CODE_PICS[0]}.png' width={s} height={s}>.
 </font>
             """,
             **kwargs)
@@ -413,5 +433,73 @@ def create_html_text(
         width=width,
         anchor_x=anchor_x,
         anchor_y=anchor_y)
+    perf_stats.count("labels")
 
     return label
+
+
+def _get_cached_label(key, create_func):
+    """
+    :param tuple key:
+    :param ()->arcade.pyglet.text.Label create_func:
+    :rtype: arcade.pyglet.text.Label
+    """
+    label = _label_cache.get(key)
+    if label is not None:
+        _label_cache.move_to_end(key)
+        perf_stats.count("label cache hits")
+        return label
+    label = create_func()
+    _label_cache[key] = label
+    while len(_label_cache) > LabelCacheMaxSize:
+        _label_cache.popitem(last=False)
+    return label
+
+
+def get_text_label(text, color, font_size=12, width=0, anchor_x="left", anchor_y="baseline"):
+    """
+    Like arcade.create_text(), but the label is reused if it was created before with the same arguments.
+    The label must not be modified.
+
+    :param str text:
+    :param Color color:
+    :param float font_size:
+    :param int width:
+    :param str anchor_x:
+    :param str anchor_y:
+    :rtype: arcade.pyglet.text.Label
+    """
+    def create():
+        perf_stats.count("labels")
+        return arcade.create_text(
+            text, color=color, font_size=font_size, width=width, anchor_x=anchor_x, anchor_y=anchor_y)
+    key = (False, text, tuple(color), font_size, width, anchor_x, anchor_y)
+    return _get_cached_label(key, create)
+
+
+def get_html_text_label(text, color, font_size=12, width=None, anchor_x="left", anchor_y="baseline"):
+    """
+    Like create_html_text(), but the label is reused if it was created before with the same arguments.
+    The label must not be modified.
+
+    :param str text:
+    :param Color color:
+    :param float font_size:
+    :param int|None width:
+    :param str anchor_x:
+    :param str anchor_y:
+    :rtype: pyglet.text.HTMLLabel
+    """
+    if width is None:
+        from .app import app
+        width = (app.window.width * 4) // 5
+    key = (True, text, tuple(color), font_size, width, anchor_x, anchor_y)
+    return _get_cached_label(key, lambda: create_html_text(
+        text, color=color, font_size=font_size, width=width, anchor_x=anchor_x, anchor_y=anchor_y))
+
+
+def reset_label_cache():
+    """
+    Call this when the entity pixel size changes, as the HTML texts can contain images of that size.
+    """
+    _label_cache.clear()
@@ -0,0 +1,149 @@
+
+"""
+Collects timings and counters of the game loop, for the on-screen performance overlay.
+This does not depend on arcade. When disabled, timer() and count() do nothing.
+"""
+
+import time
+from collections import deque
+from typing import Dict, Deque, List
+
+
+PerfWindowSize = 120  # number of samples per timing (about 2 secs at 60 FPS)
+PerfRateInterval = 1.0  # secs, for the per-second rates of the counters
+
+
+class _NullTimer:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, samples):
+        """
+        :param deque[float] samples:
+        """
+        self.samples = samples
+        self.start_time = 0.0
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.samples.append(time.perf_counter() - self.start_time)
+
+
+class PerfStats:
+    def __init__(self):
+        self.enabled = False
+        self.timings = {}  # type: Dict[str,Deque[float]]  # name -> recent durations in secs
+        self.values = {}  # type: Dict[str,float]  # name -> last value, e.g. number of sprites
+        self.counts = {}  # type: Dict[str,int]  # name -> count since rate_start_time
+        self.rates = {}  # type: Dict[str,float]  # name -> count per sec
+        self.rate_start_time = time.perf_counter()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.reset()
+
+    def reset(self):
+        self.timings.clear()
+        self.values.clear()
+        self.counts.clear()
+        self.rates.clear()
+        self.rate_start_time = time.perf_counter()
+
+    def timer(self, name):
+        """
+        Usage::
+
+            with stats.timer("Game.update"):
+                ...
+
+        :param str name:
+        :return: context manager which measures the time of the block
+        """
+        if not self.enabled:
+            return _null_timer
+        if name not in self.timings:
+            self.timings[name] = deque(maxlen=PerfWindowSize)
+        return _Timer(self.timings[name])
+
+    def add_sample(self, name, secs):
+        """
+        :param str name:
+        :param float secs: e.g. the time since the last frame
+        """
+        if not self.enabled:
+            return
+        if name not in self.timings:
+            self.timings[name] = deque(maxlen=PerfWindowSize)
+        self.timings[name].append(secs)
+
+    def count(self, name, n=1):
+        """
+        :param str name: e.g. "labels"
+        :param int n:
+        """
+        if not self.enabled:
+            return
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def set_value(self, name, value):
+        """
+        :param str name: e.g. "sprites"
+        :param float value:
+        """
+        if not self.enabled:
+            return
+        self.values[name] = value
+
+    def update_rates(self):
+        """
+        Call this once per frame. Updates self.rates every PerfRateInterval.
+        """
+        elapsed = time.perf_counter() - self.rate_start_time
+        if elapsed < PerfRateInterval:
+            return
+        self.rates = {name: count / elapsed for (name, count) in self.counts.items()}
+        self.counts.clear()
+        self.rate_start_time += elapsed
+
+    def get_timing_summary(self, name):
+        """
+        :param str name:
+        :return: avg, p50, p95, p99, in secs
+        :rtype: (float,float,float,float)
+        """
+        samples = sorted(self.timings[name])
+        if not samples:
+            return 0.0, 0.0, 0.0, 0.0
+
+        def percentile(p):
+            return samples[min(int(len(samples) * p), len(samples) - 1)]
+
+        return sum(samples) / len(samples), percentile(0.5), percentile(0.95), percentile(0.99)
+
+    def get_summary_lines(self):
+        """
+        :return: text lines for the overlay
+        :rtype: list[str]
+        """
+        lines = ["%-24s %6s %6s %6s %6s" % ("ms", "avg", "p50", "p95", "p99")]  # type: List[str]
+        for name in sorted(self.timings):
+            lines.append("%-24s %6.2f %6.2f %6.2f %6.2f" % (
+                (name,) + tuple(t * 1000. for t in self.get_timing_summary(name))))
+        for name in sorted(self.values):
+            lines.append("%-24s %6i" % (name, self.values[name]))
+        for name in sorted(self.rates):
+            lines.append("%-24s %6.1f" % (name + "/sec", self.rates[name]))
+        return lines
+
+
+stats = PerfStats()
@@ -0,0 +1,172 @@
+
+"""
+A simple sampling profiler without any extra dependencies.
+A background thread periodically looks at the stack of the profiled thread (by default the main thread)
+via sys._current_frames(). This is much cheaper than deterministic tracing (like cProfile or yappi),
+so it can be used in normal game sessions.
+
+The result is written into UserDataDir/profile:
+
+* a collapsed-stacks file ("main;update;do_robot_action 42" per line),
+  which can be used as input for flamegraph.pl or speedscope,
+* a per-function summary with the self and total samples.
+"""
+
+import os
+import sys
+import time
+import threading
+from typing import Dict, Tuple, Optional
+from .data import UserDataDir
+
+
+ProfileDir = UserDataDir + "/profile"
+SampleInterval = 0.005  # secs
+SummaryMaxNumFuncs = 50
+
+# (filename, line of def, function name)
+FuncKey = Tuple[str, int, str]
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=SampleInterval):
+        """
+        :param int|None thread_id: thread to profile. the main thread by default
+        :param float interval: secs between two samples
+        """
+        if thread_id is None:
+            thread_id = threading.main_thread().ident
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}  # type: Dict[Tuple[FuncKey,...],int]  # stack (outermost first) -> num samples
+        self.num_samples = 0
+        self.start_time = None  # type: Optional[float]
+        self.duration = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def is_running(self):
+        return self._thread is not None
+
+    def start(self):
+        assert not self._thread
+        self._stop_event.clear()
+        self.start_time = time.time()
+        self._thread = threading.Thread(target=self._thread_main, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        assert self._thread
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.duration += time.time() - self.start_time
+
+    def _thread_main(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        stack = tuple(reversed(stack))
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.num_samples += 1
+
+    @staticmethod
+    def format_func(func):
+        """
+        :param FuncKey func:
+        :return: e.g. "do_robot_action (world.py:978)"
+        :rtype: str
+        """
+        filename, line, name = func
+        return "%s (%s:%i)" % (name, os.path.basename(filename), line)
+
+    def write_collapsed_stacks(self, filename):
+        """
+        :param str filename:
+        """
+        with open(filename, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write("%s %i\n" % (";".join(self.format_func(func).replace(";", ":") for func in stack), count))
+
+    def get_func_stats(self):
+        """
+        :return: func -> (self samples, total samples)
+        :rtype: dict[FuncKey,(int,int)]
+        """
+        self_counts = {}  # type: Dict[FuncKey,int]
+        total_counts = {}  # type: Dict[FuncKey,int]
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] = self_counts.get(stack[-1], 0) + count
+            for func in set(stack):  # recursive functions only count once
+                total_counts[func] = total_counts.get(func, 0) + count
+        return {func: (self_counts.get(func, 0), total) for (func, total) in total_counts.items()}
+
+    def write_summary(self, filename):
+        """
+        :param str filename:
+        """
+        stats = self.get_func_stats()
+        total = max(self.num_samples, 1)
+        with open(filename, "w") as f:
+            f.write("Samples: %i, duration: %.1f secs, interval: %.1f ms\n\n" % (
+                self.num_samples, self.duration, self.interval * 1000.))
+            f.write("%8s %7s %8s %7s  %s\n" % ("total", "%", "self", "%", "function"))
+            for func, (self_count, total_count) in sorted(
+                    stats.items(), key=lambda item: (-item[1][1], -item[1][0]))[:SummaryMaxNumFuncs]:
+                f.write("%8i %6.1f%% %8i %6.1f%%  %s\n" % (
+                    total_count, 100. * total_count / total, self_count, 100. * self_count / total,
+                    self.format_func(func)))
+
+    def write_results(self, directory=None):
+        """
+        :param str|None directory: ProfileDir by default
+        :return: filename of the summary
+        :rtype: str
+        """
+        directory = directory or ProfileDir
+        os.makedirs(directory, exist_ok=True)
+        prefix = "%s/profile-%s" % (directory, time.strftime("%Y%m%d-%H%M%S", time.localtime(self.start_time)))
+        self.write_collapsed_stacks(prefix + ".collapsed.txt")
+        self.write_summary(prefix + ".summary.txt")
+        return prefix + ".summary.txt"
+
+
+_profiler = None  # type: Optional[SamplingProfiler]
+
+
+def is_profiling():
+    return _profiler is not None
+
+
+def start_profiler():
+    """
+    Starts the global profiler for the main thread.
+    """
+    global _profiler
+    assert not _profiler, "profiler already running"
+    _profiler = SamplingProfiler()
+    _profiler.start()
+
+
+def stop_profiler(directory=None):
+    """
+    Stops the global profiler and writes the results.
+
+    :param str|None directory: ProfileDir by default
+    :return: filename of the summary
+    :rtype: str
+    """
+    global _profiler
+    assert _profiler, "profiler not running"
+    profiler, _profiler = _profiler, None
+    profiler.stop()
+    return profiler.write_results(directory=directory)
@@ -0,0 +1,180 @@
+
+import arcade
+import numpy
+from typing import Dict, Tuple
+from .data import GFX_DIR
+from .world import Room, Place, RoomObserver, WALL_PICS, DOOR_PICS, CODE_PICS
+
+
+# These entities never move. They only change rarely, e.g. when a wall gets burned.
+StaticPics = frozenset(WALL_PICS + DOOR_PICS + CODE_PICS)
+
+
+# (name, entity_pixel_size) -> (texture, sprite scale). See get_entity_texture().
+_entity_texture_cache = {}  # type: Dict[Tuple[str,int],Tuple[arcade.Texture,float]]
+
+
+def get_entity_texture(name, entity_pixel_size):
+    """
+    The texture is loaded only once per process for each name and size.
+
+    :param str name: e.g. "figur"
+    :param int entity_pixel_size:
+    :return: texture, sprite scale
+    :rtype: (arcade.Texture, float)
+    """
+    key = (name, entity_pixel_size)
+    if key not in _entity_texture_cache:
+        texture = arcade.load_texture(file_name="%s/%s.png" % (GFX_DIR, name))
+        _entity_texture_cache[key] = (texture, entity_pixel_size / texture.width)
+    return _entity_texture_cache[key]
+
+
+def reset_entity_texture_cache():
+    """
+    Call this when the entity pixel size changes.
+    """
+    _entity_texture_cache.clear()
+
+
+class RoomRenderer(RoomObserver):
+    """
+    Draws a room. There is one sprite for the top entity of each place.
+    This attaches itself as an observer to the room, such that the room itself
+    does not need to know about any sprites.
+
+    The sprites of StaticPics are in their own static sprite list, which is uploaded to the GPU once,
+    and only again when a static entity changes. The other sprites (players, items) are in sprite_list.
+    """
+
+    def __init__(self, room):
+        """
+        :param Room room:
+        """
+        self.room = room
+        self.static_sprite_list = arcade.SpriteList(is_static=True)
+        self.sprite_list = arcade.SpriteList()
+        self.sprites = {}  # type: Dict[int,Tuple[str,arcade.Sprite]]  # place idx -> (entity name, sprite)
+        self.needs_reset = False
+        room.renderer = self
+        room.observers.append(self)
+        self.reset_sprites()
+
+    def _create_sprite(self, place, name):
+        """
+        :param Place place:
+        :param str name:
+        :rtype: arcade.Sprite
+        """
+        from .app import app
+        texture, scale = get_entity_texture(name, app.window.entity_pixel_size)
+        sprite = arcade.Sprite(scale=scale)
+        sprite.append_texture(texture)
+        sprite.set_texture(0)
+        sprite.left = (self.room.screen_offset[0] + place.x) * app.window.entity_pixel_size
+        sprite.top = app.window.height - (self.room.screen_offset[1] + place.y) * app.window.entity_pixel_size
+        return sprite
+
+    def on_place_changed(self, place):
+        """
+        :param Place place:
+        """
+        name = place.entities[-1].name if place.entities else None
+        old = self.sprites.get(place.idx)
+        if old and old[0] == name:
+            return
+        if old:
+            self._get_sprite_list(old[0]).remove(old[1])
+            del self.sprites[place.idx]
+        if name:
+            sprite = self._create_sprite(place, name)
+            self.sprites[place.idx] = (name, sprite)
+            self._get_sprite_list(name).append(sprite)
+
+    def _get_sprite_list(self, name):
+        """
+        :param str name: entity name
+        :return: the layer for this entity
+        :rtype: arcade.SpriteList
+        """
+        if name in StaticPics:
+            return self.static_sprite_list
+        return self.sprite_list
+
+    def on_room_reset(self, room):
+        """
+        :param Room room:
+        """
+        # Don't access the places now, as this would materialize the room.
+        self.needs_reset = True
+
+    def reset_sprites(self):
+        self.needs_reset = False
+        # New lists instead of removing all sprites one by one, which would update the static list each time.
+        self.static_sprite_list = arcade.SpriteList(is_static=True)
+        self.sprite_list = arcade.SpriteList()
+        self.sprites.clear()
+        for place in self.room.places:
+            self.on_place_changed(place)
+
+    def on_screen_resize(self):
+        self.reset_sprites()
+
+    def get_screen_placement(self):
+        """
+        :return: ((x1,y1), (x2,y2))
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        from .app import app
+        size = numpy.array((self.room.width, self.room.height))
+        screen_size = size * app.window.entity_pixel_size
+        pos = self.room.screen_offset * app.window.entity_pixel_size
+        return pos, pos + screen_size
+
+    def draw(self):
+        from .app import app
+        if self.needs_reset:
+            self.reset_sprites()
+        arcade.draw_rectangle_filled(
+            color=[127, 127, 127], **app.get_screen_pos_args(self.get_screen_placement()))
+        self.static_sprite_list.draw()
+        self.sprite_list.draw()
+
+    def draw_focus(self):
+        from .app import app
+        arcade.draw_rectangle_outline(
+            color=arcade.color.BLUE, **app.get_screen_pos_args(self.get_screen_placement()))
+
+    def draw_selection(self, focused=False):
+        if not self.room.selected_place:
+            return
+        from .app import app
+        p1 = (self.room.screen_offset + self.room.selected_place.coord) * app.window.entity_pixel_size
+        size = numpy.array((app.window.entity_pixel_size, app.window.entity_pixel_size))
+        p2 = p1 + size
+        center = (p1 + p2) // 2
+        arcade.draw_rectangle_outline(
+            color=arcade.color.BLUE if focused else arcade.color.BLACK,
+            center_x=center[0], center_y=app.window.height - center[1],
+            width=size[0], height=size[1])
+
+    def draw_region(self, coord1, coord2):
+        """
+        :param numpy.ndarray coord1: one corner (x,y), inclusive
+        :param numpy.ndarray coord2: the opposite corner, inclusive
+        """
+        from .app import app
+        p1 = (self.room.screen_offset + numpy.minimum(coord1, coord2)) * app.window.entity_pixel_size
+        p2 = (self.room.screen_offset + numpy.maximum(coord1, coord2) + 1) * app.window.entity_pixel_size
+        arcade.draw_rectangle_outline(color=arcade.color.RED, **app.get_screen_pos_args((p1, p2)))
+
+
+def get_room_renderer(room):
+    """
+    :param Room room:
+    :return: the renderer of the room. It is created on first use.
+    :rtype: RoomRenderer
+    """
+    if room.renderer is None:
+        RoomRenderer(room)
+    return room.renderer
@@ -0,0 +1,190 @@
+
+"""
+Recording of the input of a game session, and a headless replay of it at maximum speed.
+
+A recording contains the initial game state, the seed of World.random, the relevant Simulation settings,
+and the input events, each with the tick (Simulation.ticks) when it happened.
+The replay verifies that it ends in the same state (Simulation.get_state_hash()),
+and reports the ticks per second, so a recording can be used as an end-to-end performance test::
+
+    python -m game.replay ~/.PyOverheadGame/recordings/rec-20180101-120000.rec
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import struct
+from typing import List, Tuple
+from .data import UserDataDir
+from .world import Simulation
+from .worldfile import read_binary_world_data, write_binary_world_data
+
+
+RecordingsDir = UserDataDir + "/recordings"
+RecordingFileExt = "rec"
+RecordingMagic = b"POGR"
+RecordingVersion = 1
+# magic, version, length of the JSON header
+RecordingHeader = struct.Struct("<4sHI")
+# tick, action idx, relative x, relative y
+RecordingEvent = struct.Struct("<IBbb")
+RecordingActions = ("move", "select", "use")  # see Simulation.move_human_player etc.
+# Simulation class attributes which influence the game logic
+RecordingSettings = (
+    "Compatibility1999", "BatchRobotActions", "RobotPathFinding",
+    "OffscreenRoomsTickRate", "OffscreenRoomsMaxCatchUpTicks")
+
+
+class InputRecorder:
+    def __init__(self, sim):
+        """
+        Starts recording. The game gets reloaded from a snapshot of itself,
+        such that the session and its replay start with exactly the same state.
+
+        :param Simulation sim:
+        """
+        assert sim.human_player, "no player"
+        self.initial_data = sim.world.get_data(with_game_state=True)
+        sim.world.set_data(self.initial_data)
+        sim._load_post_init()
+        self.seed = sim.world.random_seed
+        self.settings = {key: getattr(sim, key) for key in RecordingSettings}
+        self.events = []  # type: List[Tuple[int,int,int,int]]
+        self.start_time = time.time()
+
+    def add_event(self, sim, action, relative=(0, 0)):
+        """
+        :param Simulation sim:
+        :param str action: see RecordingActions
+        :param (int,int)|numpy.ndarray relative:
+        """
+        self.events.append((sim.ticks, RecordingActions.index(action), int(relative[0]), int(relative[1])))
+
+    def save(self, sim, filename=None):
+        """
+        :param Simulation sim: at the end of the recording
+        :param str|None filename: by default a new file in RecordingsDir
+        :return: filename
+        :rtype: str
+        """
+        if not filename:
+            os.makedirs(RecordingsDir, exist_ok=True)
+            prefix = "%s/rec-%s" % (RecordingsDir, time.strftime("%Y%m%d-%H%M%S", time.localtime(self.start_time)))
+            filename = "%s.%s" % (prefix, RecordingFileExt)
+            count = 1
+            while os.path.exists(filename):
+                filename = "%s_%i.%s" % (prefix, count, RecordingFileExt)
+                count += 1
+        header = {
+            "seed": self.seed,
+            "settings": self.settings,
+            "ticks": sim.ticks,
+            "state_hash": sim.get_state_hash(),
+            "num_events": len(self.events)}
+        recording = Recording(
+            initial_data=self.initial_data, events=self.events, header=header)
+        recording.save(filename)
+        return filename
+
+
+class Recording:
+    def __init__(self, initial_data, events, header):
+        """
+        :param worldfile.WorldData initial_data:
+        :param list[(int,int,int,int)] events: (tick, action idx, relative x, relative y)
+        :param dict[str] header: seed, settings, ticks, state_hash, num_events
+        """
+        self.initial_data = initial_data
+        self.events = events
+        self.header = header
+
+    def save(self, filename):
+        """
+        :param str filename:
+        """
+        header = json.dumps(self.header, sort_keys=True).encode("utf8")
+        f = io.BytesIO()
+        f.write(RecordingHeader.pack(RecordingMagic, RecordingVersion, len(header)))
+        f.write(header)
+        write_binary_world_data(f, self.initial_data)
+        for event in self.events:
+            f.write(RecordingEvent.pack(*event))
+        with open(filename, "wb") as out:
+            out.write(f.getvalue())
+
+    @classmethod
+    def load(cls, filename):
+        """
+        :param str filename:
+        :rtype: Recording
+        """
+        buf = open(filename, "rb").read()
+        magic, version, header_len = RecordingHeader.unpack_from(buf)
+        assert magic == RecordingMagic, "not a recording: %s" % filename
+        assert version == RecordingVersion, "unsupported version %i: %s" % (version, filename)
+        offset = RecordingHeader.size
+        header = json.loads(buf[offset:offset + header_len].decode("utf8"))
+        offset += header_len
+        initial_data, offset = read_binary_world_data(buf, offset=offset, filename=filename)
+        events = list(RecordingEvent.iter_unpack(buf[offset:]))
+        assert len(events) == header["num_events"], "corrupt recording: %s" % filename
+        return cls(initial_data=initial_data, events=events, header=header)
+
+
+def replay(recording):
+    """
+    Runs the recorded session headless, as fast as possible.
+
+    :param Recording recording:
+    :return: the simulation at the end, and the time it took in secs
+    :rtype: (Simulation, float)
+    """
+    sim = Simulation()
+    for key, value in recording.header["settings"].items():
+        setattr(sim, key, value)
+    sim.world.set_data(recording.initial_data)
+    sim._load_post_init()
+    sim.world.seed_random(recording.header["seed"])
+    start_time = time.perf_counter()
+    for tick, action_idx, x, y in recording.events:
+        while sim.ticks < tick:
+            sim.do_computer_interval()
+            sim.check_finished_game()
+        action = RecordingActions[action_idx]
+        if action == "move":
+            sim.move_human_player((x, y))
+        elif action == "select":
+            sim.move_knapsack_selection((x, y))
+        elif action == "use":
+            sim.use_knapsack_selection()
+    while sim.ticks < recording.header["ticks"]:
+        sim.do_computer_interval()
+        sim.check_finished_game()
+    return sim, time.perf_counter() - start_time
+
+
+def main():
+    """
+    Replays recordings headless and verifies the final state.
+    """
+    import argparse
+    arg_parser = argparse.ArgumentParser(description=main.__doc__)
+    arg_parser.add_argument("recordings", nargs="+")
+    args = arg_parser.parse_args()
+    all_ok = True
+    for filename in args.recordings:
+        recording = Recording.load(filename)
+        sim, duration = replay(recording)
+        ok = sim.get_state_hash() == recording.header["state_hash"]
+        all_ok = all_ok and ok
+        print("%s: %s, ticks: %i, events: %i, time: %.3f secs, ticks/sec: %.1f" % (
+            filename, "OK" if ok else "STATE MISMATCH",
+            sim.ticks, len(recording.events), duration, sim.ticks / max(duration, 1e-9)))
+    if not all_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
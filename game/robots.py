@@ -0,0 +1,264 @@
+
+"""
+Batched robot logic for a whole room per computer interval.
+
+The result is exactly the same as calling world.do_robot_action() for each robot
+(with the same random numbers from World.random), but it avoids the is_allowed_together() check for each direction.
+Whether a robot may enter a place only depends on the tile ids of that place,
+so this is a lookup table over the tile ids, applied to the whole room at once,
+and kept up to date via RoomObserver.
+
+Optionally (Simulation.RobotPathFinding), the robots do not just go in the direction of the human,
+but follow the shortest path, via a distance field which is shared by all robots of the room.
+"""
+
+import numpy
+from collections import deque
+from typing import Dict, Tuple, Optional, List
+from .world import Room, Place, Entity, RoomObserver
+from .world import TILE_NAMES, ROBOT_PICS, PLAYER_PIC, ELECTRIC_WALL_PIC, WALL_PICS, CODE_PICS, DOOR_PICS
+
+
+RobotDirs = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # same order as in do_robot_action()
+
+# (Compatibility1999, ignore_robots, len(TILE_NAMES)) -> lookup table. See get_robot_passable_lut().
+_robot_passable_luts = {}  # type: Dict[Tuple[bool,bool,int],numpy.ndarray]
+
+
+def get_robot_passable_lut(compatibility1999, ignore_robots=False):
+    """
+    A robot can enter a place iff the table is true for all tile ids of the place.
+    This follows the rules in is_allowed_together() for a single robot joining the place.
+
+    :param bool compatibility1999: see Simulation.Compatibility1999
+    :param bool ignore_robots: if True, other robots do not block, i.e. this is only about the terrain
+    :return: bool array, tile id -> whether a robot can be on top of such entity
+    :rtype: numpy.ndarray
+    """
+    key = (compatibility1999, ignore_robots, len(TILE_NAMES))
+    if key not in _robot_passable_luts:
+        lut = numpy.zeros((256,), dtype=bool)
+        lut[0] = True
+        for tile_id, name in enumerate(TILE_NAMES):
+            if not name:
+                continue
+            if ignore_robots and name in ROBOT_PICS:
+                allowed = True
+            elif compatibility1999:
+                allowed = name in (PLAYER_PIC, ELECTRIC_WALL_PIC)
+            else:
+                # Only the electric wall is fine from the walls.
+                # No robot has a knapsack, thus it cannot pass any door.
+                allowed = name not in ROBOT_PICS + WALL_PICS[:2] + CODE_PICS + DOOR_PICS
+            lut[tile_id] = allowed
+        _robot_passable_luts[key] = lut
+    return _robot_passable_luts[key]
+
+
+class RobotPassability(RoomObserver):
+    """
+    Whether a robot can enter each place of the room, kept up to date incrementally.
+    Also the terrain (like passable, but ignoring other robots) and the distance field based on it.
+    """
+
+    def __init__(self, room):
+        """
+        :param Room room:
+        """
+        self.room = room
+        self.lut = None  # type: Optional[numpy.ndarray]
+        self.passable = None  # type: Optional[numpy.ndarray]  # place idx -> bool. None if outdated
+        self.terrain_lut = None  # type: Optional[numpy.ndarray]
+        self.terrain = None  # type: Optional[numpy.ndarray]  # place idx -> bool. None if outdated
+        self.terrain_version = 0  # increased whenever self.terrain changes
+        self.distance_field_key = None  # type: Optional[Tuple[int,int]]  # (terrain_version, target idx)
+        self.distance_field = None  # type: Optional[List[int]]
+        room.robot_passability = self
+        room.observers.append(self)
+
+    def get_passable(self):
+        """
+        :return: place idx -> bool
+        :rtype: numpy.ndarray
+        """
+        lut = get_robot_passable_lut(self.room.world.game.Compatibility1999)
+        if self.passable is None or lut is not self.lut:
+            self.lut = lut
+            self.passable = lut[self.room.tiles].all(axis=1)
+        return self.passable
+
+    def get_terrain(self):
+        """
+        :return: place idx -> bool
+        :rtype: numpy.ndarray
+        """
+        lut = get_robot_passable_lut(self.room.world.game.Compatibility1999, ignore_robots=True)
+        if self.terrain is None or lut is not self.terrain_lut:
+            self.terrain_lut = lut
+            self.terrain = lut[self.room.tiles].all(axis=1)
+            self.terrain_version += 1
+        return self.terrain
+
+    def get_distance_field(self, target_idx):
+        """
+        Breadth-first search from the target over the terrain.
+        This is cached until the terrain changes or there is another target.
+
+        :param int target_idx: place idx, e.g. of the human player
+        :return: place idx -> number of steps to the target. len(terrain) if unreachable
+        :rtype: list[int]
+        """
+        terrain = self.get_terrain()
+        key = (self.terrain_version, target_idx)
+        if self.distance_field_key == key:
+            return self.distance_field
+        terrain = terrain.tolist()
+        width, height = self.room.width, self.room.height
+        unreachable = len(terrain)
+        dist = [unreachable] * len(terrain)
+        dist[target_idx] = 0
+        queue = deque([target_idx])
+        while queue:
+            idx = queue.popleft()
+            x, y = idx % width, idx // width
+            for new_x, new_y in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                if not (0 <= new_x < width and 0 <= new_y < height):
+                    continue
+                new_idx = new_y * width + new_x
+                if dist[new_idx] == unreachable and terrain[new_idx]:
+                    dist[new_idx] = dist[idx] + 1
+                    queue.append(new_idx)
+        self.distance_field_key = key
+        self.distance_field = dist
+        return dist
+
+    def on_place_changed(self, place):
+        """
+        :param Place place:
+        """
+        tiles = self.room.tiles[place.idx]
+        if self.passable is not None:
+            self.passable[place.idx] = self.lut[tiles].all()
+        if self.terrain is not None:
+            value = self.terrain_lut[tiles].all()
+            if value != self.terrain[place.idx]:
+                self.terrain[place.idx] = value
+                self.terrain_version += 1
+
+    def on_room_reset(self, room):
+        """
+        :param Room room:
+        """
+        self.passable = None
+        self.terrain = None
+
+
+def get_robot_passability(room):
+    """
+    :param Room room:
+    :rtype: RobotPassability
+    """
+    if not room.robot_passability:
+        RobotPassability(room)
+    return room.robot_passability
+
+
+def do_robot_actions(room, robots, human, path_finding=False):
+    """
+    Same as::
+
+        for robot in robots:
+            do_robot_action(robot=robot, human=human)  # twice for the king
+
+    With path_finding, a robot prefers a direction which brings it closer to the human
+    according to the distance field, instead of just the direction of the human.
+    If the human is not in this room or cannot be reached, it behaves as without path_finding.
+
+    :param Room room: where the robots are
+    :param list[Entity] robots: e.g. room.find_robots()
+    :param Entity human:
+    :param bool path_finding:
+    """
+    from .world import do_robot_action, KING_PIC
+    if not robots:
+        return
+    passability = get_robot_passability(room)
+    passable = passability.get_passable()
+    width, height = room.width, room.height
+    human_x, human_y = human.room_coord.tolist()
+    dist = None  # type: Optional[List[int]]
+    if path_finding and human.room is room:
+        dist = passability.get_distance_field(human_y * width + human_x)
+    # The preferred directions (towards the human) of all the robots at once.
+    # They are only recomputed for the second action of the king, after it moved.
+    coords = numpy.array([robot.room_coord for robot in robots]).reshape((-1, 2))
+    relatives = numpy.clip(numpy.array((human_x, human_y)) - coords, -1, 1).tolist()
+    for robot, relative in zip(robots, relatives):
+        for action_idx in range(2 if robot.name == KING_PIC else 1):
+            if robot.room is not room:  # left the room with the first action
+                do_robot_action(robot=robot, human=human)
+                continue
+            x, y = robot.room_coord.tolist()
+            if action_idx > 0:
+                relative = [max(-1, min(1, human_x - x)), max(-1, min(1, human_y - y))]
+            dirs = list(RobotDirs)
+            room.world.random.shuffle(dirs)
+            if not robot.is_alive:
+                continue
+            can_move_dirs = []
+            for d in dirs:
+                new_x, new_y = x + d[0], y + d[1]
+                if not (0 <= new_x < width and 0 <= new_y < height) or passable[new_y * width + new_x]:
+                    can_move_dirs.append(d)
+            if not can_move_dirs:
+                continue  # do_robot_action() would fail to move
+            if dist and dist[y * width + x] < len(dist):
+                for d in can_move_dirs:
+                    new_x, new_y = x + d[0], y + d[1]
+                    if 0 <= new_x < width and 0 <= new_y < height and dist[new_y * width + new_x] < dist[y * width + x]:
+                        break
+                else:
+                    d = can_move_dirs[0]
+            else:
+                for d in can_move_dirs:
+                    if (relative[0] and relative[0] == d[0]) or (relative[1] and relative[1] == d[1]):
+                        break
+                else:
+                    d = can_move_dirs[0]
+            new_x, new_y = x + d[0], y + d[1]
+            if 0 <= new_x < width and 0 <= new_y < height:
+                robot.move_to_place(room.places[new_y * width + new_x])
+            else:
+                robot.move(numpy.array(d))  # into the next room
+
+
+def do_offscreen_robot_actions(room, robots, blocked_idx=None):
+    """
+    Simplified robot logic for rooms which are not visible, see Simulation.fast_forward_room().
+    The robots just walk randomly. They do not leave the room,
+    and they do not enter the blocked place (e.g. where the human just entered the room).
+
+    :param Room room: where the robots are
+    :param list[Entity] robots: e.g. room.find_robots()
+    :param int|None blocked_idx: place idx
+    """
+    from .world import KING_PIC
+    if not robots:
+        return
+    passable = get_robot_passability(room).get_passable()
+    width, height = room.width, room.height
+    for robot in robots:
+        for _ in range(2 if robot.name == KING_PIC else 1):
+            if not robot.is_alive:
+                break
+            x, y = robot.room_coord.tolist()
+            dirs = list(RobotDirs)
+            room.world.random.shuffle(dirs)
+            for d in dirs:
+                new_x, new_y = x + d[0], y + d[1]
+                if not (0 <= new_x < width and 0 <= new_y < height):
+                    continue
+                new_idx = new_y * width + new_x
+                if new_idx != blocked_idx and passable[new_idx]:
+                    robot.move_to_place(room.places[new_idx])
+                    break
@@ -0,0 +1,276 @@
+
+"""
+Optional store of saved games in a local SQLite database (Simulation.UseSaveStore),
+as an alternative to the loose .spi/.spb files in GameDataDirs[0].
+
+Each save has its content (the binary world format, see worldfile.write_binary_world_data(), zlib-compressed),
+and indexed metadata (name, room, scores, lives, diamonds, time),
+such that listing, searching by name prefix and finding a unique name are single indexed queries,
+even with many saves.
+Saves can be imported from and exported to all the world file formats, e.g. to exchange them as .spi::
+
+    python -m game.savestore list
+    python -m game.savestore import ~/.PyOverheadGame/game/*.spi
+    python -m game.savestore export mysave mysave.spi
+"""
+
+import io
+import os
+import time
+import zlib
+import sqlite3
+from .data import UserDataDir
+from .worldfile import WorldData, read_binary_world_data, write_binary_world_data
+
+
+SaveStoreFilename = UserDataDir + "/saves.sqlite"
+SaveStoreSchemaVersion = 1
+SaveStoreCompressLevel = 6
+SaveStoreOrders = {
+    "time": "timestamp DESC",
+    "name": "name",
+    "scores": "scores DESC, timestamp DESC"}
+
+SaveStoreSchema = """
+CREATE TABLE IF NOT EXISTS saves (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    room_idx INTEGER NOT NULL,
+    scores INTEGER NOT NULL,
+    lives INTEGER NOT NULL,
+    diamonds INTEGER NOT NULL,  -- bit i: diamond i activated
+    timestamp REAL NOT NULL,
+    data BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS saves_timestamp ON saves (timestamp);
+CREATE INDEX IF NOT EXISTS saves_scores ON saves (scores);
+"""
+
+SaveInfoColumns = "id, name, room_idx, scores, lives, diamonds, timestamp"
+
+
+def get_prefix_range(prefix):
+    """
+    All strings starting with prefix are in the range [prefix, end),
+    such that a prefix search can use the index on the name, unlike LIKE.
+
+    :param str prefix: non-empty
+    :return: (prefix, end). end is None if there is no upper bound
+    :rtype: (str, str|None)
+    """
+    prefix = prefix.rstrip(chr(0x10ffff))
+    if not prefix:
+        return "", None
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class SaveInfo:
+    """
+    The metadata of a save, without its content.
+    """
+
+    def __init__(self, id, name, room_idx, scores, lives, diamonds, timestamp):
+        """
+        :param int id:
+        :param str name:
+        :param int room_idx: where the human player is
+        :param int scores:
+        :param int lives:
+        :param int diamonds: bit mask, bit i: diamond i activated
+        :param float timestamp: time.time() of the save
+        """
+        self.id = id
+        self.name = name
+        self.room_idx = room_idx
+        self.scores = scores
+        self.lives = lives
+        self.diamonds = diamonds
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return "<SaveInfo %r>" % self.name
+
+    def get_num_diamonds_activated(self):
+        """
+        :rtype: int
+        """
+        return bin(self.diamonds).count("1")
+
+    def get_description(self):
+        """
+        :return: e.g. "room 3, score 120, lives 2, diamonds 1, 2018-01-01 12:00"
+        :rtype: str
+        """
+        return "room %i, score %i, lives %i, diamonds %i, %s" % (
+            self.room_idx + 1, self.scores, self.lives, self.get_num_diamonds_activated(),
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(self.timestamp)))
+
+
+class SaveStore:
+    def __init__(self, filename=None):
+        """
+        :param str|None filename: SaveStoreFilename by default. ":memory:" is also possible
+        """
+        filename = filename or SaveStoreFilename
+        if filename != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        assert version in (0, SaveStoreSchemaVersion), "unsupported save store version %i: %s" % (version, filename)
+        with self.connection:
+            self.connection.executescript(SaveStoreSchema)
+            self.connection.execute("PRAGMA user_version = %i" % SaveStoreSchemaVersion)
+
+    def close(self):
+        self.connection.close()
+
+    def put(self, data, name=None, overwrite=False):
+        """
+        :param WorldData data: with game state
+        :param str|None name: data.name by default
+        :param bool overwrite: if False, the name must not exist yet
+        :rtype: SaveInfo
+        """
+        name = name or data.name
+        assert name, "no name"
+        f = io.BytesIO()
+        write_binary_world_data(f, data)
+        blob = zlib.compress(f.getvalue(), SaveStoreCompressLevel)
+        diamonds = sum(1 << i for (i, activated) in enumerate(data.diamonds_activated) if activated)
+        values = (name, data.room_idx, data.scores, data.lives, diamonds, time.time(), blob)
+        with self.connection:
+            if overwrite:
+                self.connection.execute("DELETE FROM saves WHERE name = ?", (name,))
+            cursor = self.connection.execute(
+                "INSERT INTO saves (name, room_idx, scores, lives, diamonds, timestamp, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", values)
+        return SaveInfo(cursor.lastrowid, *values[:-1])
+
+    def get(self, name):
+        """
+        :param str name:
+        :rtype: WorldData
+        """
+        row = self.connection.execute("SELECT data FROM saves WHERE name = ?", (name,)).fetchone()
+        assert row, "save not found: %r" % name
+        data, _ = read_binary_world_data(zlib.decompress(row[0]), filename="%s:%s" % (self.filename, name))
+        data.name = name
+        return data
+
+    def get_info(self, name):
+        """
+        :param str name:
+        :rtype: SaveInfo|None
+        """
+        row = self.connection.execute(
+            "SELECT %s FROM saves WHERE name = ?" % SaveInfoColumns, (name,)).fetchone()
+        return SaveInfo(*row) if row else None
+
+    def delete(self, name):
+        """
+        :param str name:
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM saves WHERE name = ?", (name,))
+
+    def list(self, search=None, order="time", limit=None):
+        """
+        :param str|None search: only names which start with this (case-sensitive)
+        :param str order: see SaveStoreOrders
+        :param int|None limit:
+        :rtype: list[SaveInfo]
+        """
+        query = "SELECT %s FROM saves" % SaveInfoColumns
+        args = []
+        if search:
+            start, end = get_prefix_range(search)
+            query += " WHERE name >= ?"
+            args.append(start)
+            if end is not None:
+                query += " AND name < ?"
+                args.append(end)
+        query += " ORDER BY " + SaveStoreOrders[order]
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+        return [SaveInfo(*row) for row in self.connection.execute(query, args)]
+
+    def get_unique_name(self, name, taken=None):
+        """
+        Like world.get_unique_game_file(), but with a single (indexed) query.
+
+        :param str name: e.g. "game"
+        :param set[str]|None taken: names which do not exist yet, but will soon, e.g. pending background saves
+        :return: name which does not exist yet, e.g. "game" or "game_1" or so
+        :rtype: str
+        """
+        # All names starting with name + "_". "`" is the next character after "_".
+        existing = {row[0] for row in self.connection.execute(
+            "SELECT name FROM saves WHERE name = ? OR (name >= ? AND name < ?)", (name, name + "_", name + "`"))}
+        existing.update(taken or ())
+        if name not in existing:
+            return name
+        count = 1
+        while "%s_%i" % (name, count) in existing:
+            count += 1
+        return "%s_%i" % (name, count)
+
+    def import_file(self, filename, name=None):
+        """
+        :param str filename: any of worldfile.FileExts, with game state
+        :param str|None name: by default the file name without extension, made unique
+        :rtype: SaveInfo
+        """
+        from .worldfile import read_world_file
+        data = read_world_file(filename)
+        assert data.has_game_state, "not a saved game: %s" % filename
+        if not name:
+            name = self.get_unique_name(os.path.splitext(os.path.basename(filename))[0])
+        return self.put(data, name=name)
+
+    def export_file(self, name, filename):
+        """
+        :param str name:
+        :param str filename: any of worldfile.FileExts
+        """
+        from .worldfile import write_world_file
+        assert not os.path.exists(filename), "file exists already: %s" % filename
+        write_world_file(filename, self.get(name))
+
+
+def main():
+    """
+    Lists, imports and exports the saved games in the save store.
+    """
+    import argparse
+    arg_parser = argparse.ArgumentParser(description=main.__doc__)
+    arg_parser.add_argument("--store", help="default: %s" % SaveStoreFilename)
+    sub_parsers = arg_parser.add_subparsers(dest="command")
+    list_parser = sub_parsers.add_parser("list")
+    list_parser.add_argument("--search", help="only names which start with this")
+    list_parser.add_argument("--order", choices=sorted(SaveStoreOrders), default="time")
+    import_parser = sub_parsers.add_parser("import")
+    import_parser.add_argument("files", nargs="+")
+    export_parser = sub_parsers.add_parser("export")
+    export_parser.add_argument("name")
+    export_parser.add_argument("file")
+    delete_parser = sub_parsers.add_parser("delete")
+    delete_parser.add_argument("name")
+    args = arg_parser.parse_args()
+    store = SaveStore(args.store)
+    if args.command == "import":
+        for filename in args.files:
+            info = store.import_file(filename)
+            print("%s -> %r" % (filename, info.name))
+    elif args.command == "export":
+        store.export_file(args.name, args.file)
+    elif args.command == "delete":
+        store.delete(args.name)
+    else:
+        for info in store.list(search=args.search if args.command else None, order=getattr(args, "order", "time")):
+            print("%s: %s" % (info.name, info.get_description()))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+
+"""
+Measures the startup of the game: the wall-clock time per phase (e.g. "import game.app", "Game")
+and per imported module, written as JSON::
+
+    python3 main.py --startup-profile [startup.json] [--startup-budget 2.0]
+
+In this mode, the game exits right after the startup, i.e. before the main loop,
+and the exit code is 1 if the total startup time is over the budget.
+
+This module must not import anything heavy (arcade, pyglet, numpy) itself,
+because it needs to be set up before all of these are imported.
+"""
+
+import sys
+import time
+import json
+from typing import List, Dict, Tuple, Optional
+
+
+StartupProfileArg = "--startup-profile"
+StartupProfileMaxNumImports = 50  # in the printed summary. the JSON file has all of them
+
+
+class _TimedLoader:
+    """
+    Wraps the loader of a module spec, to measure how long the module takes to load.
+    """
+
+    def __init__(self, loader, name, profile):
+        """
+        :param importlib.abc.Loader loader:
+        :param str name: module name
+        :param StartupProfile profile:
+        """
+        self._loader = loader
+        self._name = name
+        self._profile = profile
+
+    def create_module(self, spec):
+        if not hasattr(self._loader, "create_module"):
+            return None  # default module creation
+        with self._profile.import_timer(self._name):
+            return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self._loader
+        with self._profile.import_timer(self._name):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, item):
+        return getattr(self._loader, item)
+
+
+class _ImportTimer:
+    """
+    Context manager for a single (maybe nested) import.
+    """
+
+    def __init__(self, profile, name):
+        """
+        :param StartupProfile profile:
+        :param str name:
+        """
+        self.profile = profile
+        self.name = name
+        self.start_time = 0.0
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        self.profile.import_stack.append(0.0)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        total = time.perf_counter() - self.start_time
+        children = self.profile.import_stack.pop()
+        if self.profile.import_stack:
+            self.profile.import_stack[-1] += total
+        self_time, total_time = self.profile.imports.get(self.name, (0.0, 0.0))
+        self.profile.imports[self.name] = (self_time + total - children, total_time + total)
+
+
+class StartupProfile:
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.phases = []  # type: List[Tuple[str,float]]  # (name, secs), in order
+        self.imports = {}  # type: Dict[str,Tuple[float,float]]  # module -> (self secs, total secs)
+        self.import_stack = []  # type: List[float]  # time spent in nested imports, per active import
+        self._finding = False
+
+    def install(self):
+        """
+        Measures all imports from now on.
+        """
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path=None, target=None):
+        """
+        Meta path finder protocol. Uses the other finders, and wraps the loader of the found spec.
+        """
+        if self._finding:
+            return None
+        self._finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding = False
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, fullname, self)
+        return spec
+
+    def import_timer(self, name):
+        """
+        :param str name: module name
+        :rtype: _ImportTimer
+        """
+        return _ImportTimer(self, name)
+
+    def add_phase(self, name, secs):
+        """
+        :param str name:
+        :param float secs:
+        """
+        self.phases.append((name, secs))
+
+    def get_total_time(self):
+        """
+        :return: secs since the profile was created
+        :rtype: float
+        """
+        return time.perf_counter() - self.start_time
+
+    def get_result(self, budget=None):
+        """
+        :param float|None budget: max total secs
+        :rtype: dict[str]
+        """
+        total = self.get_total_time()
+        return {
+            "total": total,
+            "budget": budget,
+            "over_budget": budget is not None and total > budget,
+            "phases": [{"name": name, "secs": secs} for (name, secs) in self.phases],
+            "imports": [
+                {"name": name, "self": self_time, "total": total_time}
+                for (name, (self_time, total_time)) in sorted(
+                    self.imports.items(), key=lambda item: -item[1][1])]}
+
+    def write(self, filename, budget=None):
+        """
+        Writes the result as JSON, and prints a summary.
+
+        :param str filename:
+        :param float|None budget: max total secs
+        :return: whether the startup was within the budget
+        :rtype: bool
+        """
+        self.uninstall()
+        result = self.get_result(budget=budget)
+        with open(filename, "w") as f:
+            json.dump(result, f, indent=2)
+        print("Startup time: %.3f secs%s" % (
+            result["total"], (" (budget: %.3f secs)" % budget) if budget is not None else ""))
+        for info in result["phases"]:
+            print("  %-40s %8.3f" % (info["name"], info["secs"]))
+        print("Imports (self / total secs):")
+        for info in result["imports"][:StartupProfileMaxNumImports]:
+            print("  %-40s %8.3f %8.3f" % (info["name"], info["self"], info["total"]))
+        print("Startup profile written to:", filename)
+        return not result["over_budget"]
+
+
+class _Phase:
+    def __init__(self, name):
+        """
+        :param str name:
+        """
+        self.name = name
+        self.start_time = 0.0
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if profile:
+            profile.add_phase(self.name, time.perf_counter() - self.start_time)
+
+
+profile = None  # type: Optional[StartupProfile]
+
+
+def init(argv=None):
+    """
+    Starts the startup profile if StartupProfileArg is in the command line.
+    This is called before the command line is parsed (game.app.main),
+    because the imports before that should also be measured.
+
+    :param list[str]|None argv: sys.argv by default
+    """
+    if argv is None:
+        argv = sys.argv
+    if any(arg == StartupProfileArg or arg.startswith(StartupProfileArg + "=") for arg in argv[1:]):
+        start()
+
+
+def start():
+    """
+    Starts the startup profile, if not started yet.
+    """
+    global profile
+    if not profile:
+        profile = StartupProfile()
+        profile.install()
+
+
+def phase(name):
+    """
+    Usage::
+
+        with startup.phase("Game"):
+            ...
+
+    :param str name:
+    :return: context manager which measures the time of the block, if the startup profile is active
+    """
+    return _Phase(name)
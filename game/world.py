@@ -0,0 +1,1478 @@
+
+import os
+import heapq
+import numpy
+import random
+import threading
+from typing import List, Dict, Optional
+from .data import DATA_DIR, UserDataDir
+
+
+GAME_DATA_DIR = DATA_DIR + "/game"
+GameDataDirs = (UserDataDir + "/game", GAME_DATA_DIR)
+
+BACKGROUND_PIC = 'hinter'
+PLAYER_PIC = "figur"
+KING_PIC = "konig"
+ROBOT_PICS = [KING_PIC] + ['robot%i' % i for i in range(1, 10)]
+PLAYER_PICS = [PLAYER_PIC] + ROBOT_PICS
+KEY_PICS = ["schl%i" % i for i in range(1, 10)]
+DOOR_PICS = ["tuer%i" % i for i in range(1, 10)]
+DIAMOND_PICS = ["diamant%i" % i for i in range(1, 4)]
+CODE_PICS = ["code%i" % i for i in range(1, 4)]
+SCORES_PICS = ["punkt%i" % i for i in range(1, 6)]
+GET_LIVE_PIC = "leben"
+BURN_PIC = "aetz"
+SAVE_PIC = "speicher"
+KILL_PIC = "kill"
+SOFT_WALL_PIC = "wand1"
+HARD_WALL_PIC = "wand2"
+ELECTRIC_WALL_PIC = "wand3"
+WALL_PICS = [SOFT_WALL_PIC, HARD_WALL_PIC, ELECTRIC_WALL_PIC]
+BURNABLE_PICS = [SOFT_WALL_PIC]
+COLLECTABLE_PICS = [SAVE_PIC, BURN_PIC, GET_LIVE_PIC] + KEY_PICS + DIAMOND_PICS
+ALL_PICS = PLAYER_PICS + KEY_PICS + DOOR_PICS + DIAMOND_PICS + CODE_PICS + SCORES_PICS + \
+    [GET_LIVE_PIC, BURN_PIC, KILL_PIC] + WALL_PICS
+ERROR_PIC = 'error'  # used for error-displaying
+
+# Tile-type ids, used for the array-backed storage of the places (see Room.tiles).
+# Id 0 means that there is no entity at all, i.e. background.
+TILE_NAMES = [""] + ALL_PICS + [SAVE_PIC, ERROR_PIC]
+TILE_IDS = {name: i for (i, name) in enumerate(TILE_NAMES)}  # type: Dict[str,int]
+# get_tile_id() also gets called from other threads, e.g. by worldfile.AsyncWorldFileWriter.
+_tile_ids_lock = threading.Lock()
+TILE_DTYPE = numpy.uint8
+PLACE_STACK_DEPTH = 4  # max number of entities in one place, e.g. item + player + robot
+
+# room count
+WORLD_WIDTH = 5
+WORLD_HEIGHT = 4
+# entity/place count in a room
+ROOM_WIDTH = 20
+ROOM_HEIGHT = 20
+# entity/item/place count in the knapsack
+KNAPSACK_WIDTH = 3
+KNAPSACK_HEIGHT = 9
+KNAPSACK_MAX = 27  # compatibility with Robot1 (9*3)
+
+COMPUTER_CONTROL_INTERVAL = 0.75  # timer-interval for computer player control
+MAX_CATCH_UP_TICKS = 5  # max number of computer intervals in one update, e.g. after the window was stalled
+
+# Names of the in-memory snapshots, see World.take_snapshot(). Quicksave slots are "quick<slot>".
+SNAPSHOT_LOADED = "loaded"  # the state right after World.load(), see Simulation.restart()
+SNAPSHOT_ROOM_ENTERED = "room"  # when the current room was entered, see Simulation.retry_room()
+
+# Prefix of the keys of background saves into the save store, see Simulation.save_to_store().
+SaveStoreKeyPrefix = "store:"
+
+
+class TickScheduler:
+    """
+    Fixed-timestep scheduling of the game logic ticks (computer intervals), independent from the frame rate.
+    After a stall, at most max_catch_up_ticks are run at once, and the remaining ones are dropped.
+    """
+
+    def __init__(self, interval=COMPUTER_CONTROL_INTERVAL, max_catch_up_ticks=MAX_CATCH_UP_TICKS):
+        """
+        :param float interval: secs per tick, with speed 1
+        :param int max_catch_up_ticks:
+        """
+        self.interval = interval
+        self.max_catch_up_ticks = max_catch_up_ticks
+        self.speed = 1.0  # multiplier, e.g. 4 for fast-forward
+        self.paused = False
+        self.time_accumulated = 0.0  # secs (scaled by speed) not yet consumed by ticks
+        self.ticks = 0  # number of scheduled ticks
+        self.dropped_ticks = 0  # number of ticks skipped because of max_catch_up_ticks
+
+    def reset(self):
+        self.time_accumulated = 0.0
+
+    def advance(self, delta_time):
+        """
+        :param float delta_time: secs since the last call
+        :return: number of ticks to run now
+        :rtype: int
+        """
+        if self.paused:
+            return 0
+        self.time_accumulated += delta_time * self.speed
+        num_ticks = int(self.time_accumulated // self.interval)
+        self.time_accumulated -= num_ticks * self.interval
+        if num_ticks > self.max_catch_up_ticks:
+            self.dropped_ticks += num_ticks - self.max_catch_up_ticks
+            num_ticks = self.max_catch_up_ticks
+        self.ticks += num_ticks
+        return num_ticks
+
+
+class Simulation:
+    """
+    The game state and the game logic, without any window, sprites or menus.
+    This can be used headless, e.g. for testing or batch runs.
+    The interactive game (game.Game) extends this.
+    """
+    Compatibility1999 = True
+    SaveFileExt = "spi"  # or "spb", or "spd" (small, relative to game_selected), see worldfile.FileExts
+    BatchRobotActions = True  # see robots.do_robot_actions(). same result, just faster
+    RobotPathFinding = False  # robots follow the shortest path to the human. needs BatchRobotActions
+    # The rooms which are not visible are simulated with this many ticks per tick of the visible room.
+    # That is done when the room is entered again, see fast_forward_room(). 0 means they are frozen.
+    OffscreenRoomsTickRate = 0.0
+    OffscreenRoomsMaxCatchUpTicks = 20
+    RandomSeed = None  # type: Optional[int]  # for World.random. None: a new seed for every loaded game
+    UseSaveStore = False  # save into the SQLite save store instead of files. see savestore.py
+
+    def __init__(self):
+        self.world = World(game=self)
+        self.cur_room = self.world.get_room((0, 0))
+        self.human_player = None  # type: Optional[Entity]
+        self.tick_scheduler = TickScheduler()
+        self.ticks = 0  # number of computer intervals since the game was loaded
+        self.info_text = ""
+        self.recheck_finished_game = False
+        self.game_selected = "robot.sce"
+        self.recorder = None  # type: Optional[replay.InputRecorder]
+        self.save_store = None  # type: Optional[savestore.SaveStore]  # see get_save_store()
+        self.world_writer = None  # type: Optional[worldfile.AsyncWorldFileWriter]  # see save()
+
+    def init(self):
+        self.load(self.game_selected)
+
+    def restart(self):
+        """
+        Restarts game_selected. If that is the loaded game, this restores the snapshot of the load,
+        without reading the file again.
+        """
+        filename = self.game_selected
+        if "/" not in filename:
+            filename = find_game_file(filename)
+        if self.world.loaded_filename == filename and self.world.has_snapshot(SNAPSHOT_LOADED):
+            self.restore_snapshot(SNAPSHOT_LOADED)
+        else:
+            self.init()
+        self.set_info_text("Game restarted")
+
+    def restore_snapshot(self, name):
+        """
+        :param str name: see World.take_snapshot()
+        """
+        if self.recorder:
+            self.stop_recording()
+        self.world.restore_snapshot(name)
+        self._load_post_init()
+
+    def quicksave(self, slot=0):
+        """
+        :param int slot:
+        """
+        self.world.take_snapshot("quick%i" % slot)
+        self.set_info_text("Quicksaved")
+
+    def quickload(self, slot=0):
+        """
+        E.g. after the human player died.
+
+        :param int slot:
+        :return: whether there was a quicksave in this slot
+        :rtype: bool
+        """
+        if not self.world.has_snapshot("quick%i" % slot):
+            self.set_info_text("No quicksave")
+            return False
+        self.restore_snapshot("quick%i" % slot)
+        self.set_info_text("Quickloaded")
+        return True
+
+    def retry_room(self):
+        """
+        Goes back to the state when the human player entered the current room (or when the game was loaded).
+
+        :return: whether that was possible
+        :rtype: bool
+        """
+        if not self.world.has_snapshot(SNAPSHOT_ROOM_ENTERED):
+            return False
+        self.restore_snapshot(SNAPSHOT_ROOM_ENTERED)
+        self.set_info_text("Retry room")
+        return True
+
+    def set_info_text(self, info_txt):
+        """
+        :param str info_txt:
+        """
+        self.info_text = info_txt
+
+    def load_empty(self):
+        if self.recorder:
+            self.stop_recording()
+        self.world.load_empty()
+        self._load_post_init()
+
+    def load(self, filename):
+        """
+        :param str filename:
+        """
+        if self.recorder:
+            self.stop_recording()
+        self.world.load(filename)
+        self._load_post_init()
+
+    def _load_post_init(self):
+        self.human_player = self.world.find_human_player()
+        if self.human_player:
+            self.human_player.knapsack.selected_place = self.human_player.knapsack.get_place((0, 0))
+            self.cur_room = self.human_player.room
+        else:
+            self.cur_room = self.world.rooms[0]
+        self.tick_scheduler.reset()
+        self.ticks = 0
+        for room in self.world.rooms:
+            room.last_tick = 0
+        self.world.seed_random(self.RandomSeed)
+        self.world.take_snapshot(SNAPSHOT_ROOM_ENTERED)
+
+    def save(self, filename, callback=None):
+        """
+        :param str filename: e.g. "name.spi", in GameDataDirs[0]
+        :param ((str,Exception|None)->None)|None callback: if given, the file is written in the background,
+            and this is called via poll_saves() when done. Otherwise it is written right away
+        """
+        if callback is None:
+            self.world.save(filename)
+            return
+        self.world.save(filename, writer=self._get_world_writer(), callback=callback)
+
+    def _get_world_writer(self):
+        """
+        :rtype: worldfile.AsyncWorldFileWriter
+        """
+        from .worldfile import AsyncWorldFileWriter
+        if not self.world_writer:
+            self.world_writer = AsyncWorldFileWriter()
+        return self.world_writer
+
+    def get_pending_saves(self):
+        """
+        :return: file names (without directory) which are still being written in the background
+        :rtype: set[str]
+        """
+        if not self.world_writer:
+            return set()
+        with self.world_writer.lock:
+            return {
+                os.path.basename(filename) for filename in self.world_writer.pending
+                if not filename.startswith(SaveStoreKeyPrefix)}
+
+    def get_pending_store_saves(self):
+        """
+        :return: names which are still being saved into the save store in the background
+        :rtype: set[str]
+        """
+        if not self.world_writer:
+            return set()
+        with self.world_writer.lock:
+            return {
+                key[len(SaveStoreKeyPrefix):] for key in self.world_writer.pending
+                if key.startswith(SaveStoreKeyPrefix)}
+
+    def poll_saves(self):
+        """
+        Calls the callbacks of the finished background saves. See save().
+        """
+        if self.world_writer:
+            self.world_writer.poll()
+
+    def wait_for_saves(self):
+        if self.world_writer:
+            self.world_writer.wait()
+
+    def get_save_store(self):
+        """
+        :return: the save store, opened on the first call
+        :rtype: savestore.SaveStore
+        """
+        from .savestore import SaveStore
+        if not self.save_store:
+            self.save_store = SaveStore()
+        return self.save_store
+
+    def load_from_store(self, name):
+        """
+        :param str name: see savestore.SaveStore.list()
+        """
+        if self.recorder:
+            self.stop_recording()
+        self.world.set_data(self.get_save_store().get(name))
+        self._load_post_init()
+
+    def save_to_store(self, name, callback=None):
+        """
+        :param str name: should not exist yet in the store, see savestore.SaveStore.get_unique_name()
+        :param ((str,Exception|None)->None)|None callback: if given, the save is written in the background,
+            via the same writer as the files (see save()), and this is called with the name and the error.
+            Otherwise it is written right away
+        :return: the info, if it was written right away
+        :rtype: savestore.SaveInfo|None
+        """
+        data = self.world.get_data(with_game_state=True)
+        data.name = name
+        if callback is None:
+            return self.get_save_store().put(data)
+        store_filename = self.get_save_store().filename
+        assert store_filename != ":memory:", "background saves need a store file"
+
+        def write_func(_key, data_):
+            from .savestore import SaveStore
+            store = SaveStore(store_filename)  # own connection, as this is another thread
+            try:
+                store.put(data_)
+            finally:
+                store.close()
+
+        self._get_world_writer().write(
+            SaveStoreKeyPrefix + name, data,
+            callback=lambda _key, error: callback(name, error), write_func=write_func)
+        return None
+
+    def start_recording(self):
+        """
+        Records the input from now on, such that this session can be replayed. See replay.py.
+        """
+        from .replay import InputRecorder
+        assert not self.recorder, "already recording"
+        self.recorder = InputRecorder(self)
+
+    def stop_recording(self):
+        """
+        :return: filename of the recording
+        :rtype: str
+        """
+        recorder, self.recorder = self.recorder, None
+        return recorder.save(self)
+
+    def move_human_player(self, relative):
+        """
+        :param (int,int)|numpy.ndarray relative: (x,y)
+        """
+        if self.recorder:
+            self.recorder.add_event(self, "move", relative)
+        self.human_player.move(numpy.array(relative))
+        if self.human_player.room is not self.cur_room:
+            self.enter_room(self.human_player.room)
+        self.check_finished_game()
+
+    def enter_room(self, room):
+        """
+        Makes the room the visible one, and simulates the time while it was not visible.
+
+        :param Room room:
+        """
+        self.cur_room.last_tick = self.ticks
+        self.cur_room = room
+        self.fast_forward_room(room)
+        self.world.take_snapshot(SNAPSHOT_ROOM_ENTERED)
+
+    def fast_forward_room(self, room):
+        """
+        Simulates the ticks since the room was visible the last time,
+        with the reduced rate OffscreenRoomsTickRate and at most OffscreenRoomsMaxCatchUpTicks.
+        This uses the simplified logic robots.do_offscreen_robot_actions().
+
+        :param Room room:
+        """
+        num_ticks = int((self.ticks - room.last_tick) * self.OffscreenRoomsTickRate)
+        num_ticks = min(num_ticks, self.OffscreenRoomsMaxCatchUpTicks)
+        room.last_tick = self.ticks
+        if num_ticks <= 0:
+            return
+        from .robots import do_offscreen_robot_actions
+        blocked_idx = None
+        if self.human_player and self.human_player.room is room:
+            blocked_idx = room.coord_to_idx(self.human_player.room_coord)
+        for _ in range(num_ticks):
+            do_offscreen_robot_actions(room=room, robots=room.find_robots(), blocked_idx=blocked_idx)
+
+    def move_knapsack_selection(self, relative):
+        """
+        :param (int,int)|numpy.ndarray relative: (x,y)
+        """
+        if self.recorder:
+            self.recorder.add_event(self, "select", relative)
+        self.human_player.knapsack.move_selection(numpy.array(relative))
+
+    def use_knapsack_selection(self):
+        if self.recorder:
+            self.recorder.add_event(self, "use")
+        place = self.human_player.knapsack.selected_place
+        if not place.entities:
+            return
+        item = place.entities[-1]
+        do_item_action(player=self.human_player, item=item)
+        if not item.place.entities:  # if item was used/killed
+            # Select any other such item in the knapsack, if there is one.
+            others = self.human_player.knapsack.find_entities([item.name])
+            if others:
+                self.human_player.knapsack.selected_place = others[0].place
+        self.check_finished_game()
+
+    def do_computer_interval(self):
+        self.ticks += 1
+        self.cur_room.last_tick = self.ticks
+        if self.BatchRobotActions:
+            from .robots import do_robot_actions
+            do_robot_actions(
+                room=self.cur_room, robots=self.cur_room.find_robots(), human=self.human_player,
+                path_finding=self.RobotPathFinding)
+            return
+        for player in self.cur_room.find_robots():
+            do_robot_action(robot=player, human=self.human_player)
+            if player.name == KING_PIC:
+                # The king does two actions at once.
+                do_robot_action(robot=player, human=self.human_player)
+
+    def update(self, delta_time):
+        """
+        Game logic.
+
+        :param float delta_time: how much time passed
+        """
+        for _ in range(self.tick_scheduler.advance(delta_time)):
+            self.do_computer_interval()
+            self.check_finished_game()
+
+    def check_finished_game(self):
+        if self.recheck_finished_game:
+            if not self.world.find_king():
+                self.world.finish_game()
+                self.on_finished_game()
+            self.recheck_finished_game = False
+
+    def get_state_hash(self):
+        """
+        :return: hash over the whole game state, e.g. to compare a replay with the original session
+        :rtype: str
+        """
+        import hashlib
+        h = hashlib.sha1(self.world.tiles.tobytes())
+        if self.human_player:
+            h.update(self.human_player.knapsack.tiles.tobytes())
+            h.update(repr((self.human_player.scores, self.human_player.lives, self.human_player.is_alive)).encode())
+        h.update(repr((self.world.diamonds_activated, self.cur_room.idx, self.ticks)).encode())
+        return h.hexdigest()
+
+    def on_finished_game(self):
+        """
+        Called when the king is defeated, after World.finish_game().
+        """
+        pass
+
+
+class World:
+    def __init__(self, game):
+        """
+        :param Simulation game:
+        """
+        self.game = game
+        # room idx -> place idx -> stack of tile ids. Each room has a view on it.
+        self.tiles = numpy.zeros(
+            (WORLD_WIDTH * WORLD_HEIGHT, ROOM_WIDTH * ROOM_HEIGHT, PLACE_STACK_DEPTH), dtype=TILE_DTYPE)
+        # Registry of all players (human, king, robots) in the world rooms. Kept in sync by the rooms.
+        self.players_by_name = {name: {} for name in PLAYER_PICS}  # type: Dict[str,Dict[Entity,None]]
+        self.rooms = [Room(world=self, idx=i, tiles=self.tiles[i]) for i in range(WORLD_WIDTH * WORLD_HEIGHT)]
+        self.diamonds_activated = [False] * len(DIAMOND_PICS)
+        # All randomness of the game logic comes from here, such that a game can be reproduced.
+        self.random = random.Random()
+        self.random_seed = None  # type: Optional[int]
+        self.snapshots = {}  # type: Dict[str,worldfile.WorldData]  # see take_snapshot()
+        self.loaded_filename = None  # type: Optional[str]  # full filename of the last load()
+
+    def seed_random(self, seed=None):
+        """
+        :param int|None seed: a new random seed by default
+        """
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.random_seed = seed
+        self.random.seed(seed)
+
+    def _reset_diamonds(self):
+        for i in range(len(DIAMOND_PICS)):
+            self.diamonds_activated[i] = False
+
+    @staticmethod
+    def valid_coord(coord):
+        """
+        :param (int,int)|numpy.ndarray coord:
+        :rtype: bool
+        """
+        x, y = coord
+        return 0 <= x < WORLD_WIDTH and 0 <= y < WORLD_HEIGHT
+
+    @staticmethod
+    def coord_to_idx(coord):
+        """
+        :param (int,int)|numpy.ndarray coord:
+        :rtype: int
+        """
+        assert World.valid_coord(coord)
+        x, y = coord
+        return y * WORLD_WIDTH + x
+
+    @staticmethod
+    def idx_to_coord(idx):
+        """
+        :param int idx:
+        :return: (x,y) coord
+        :rtype: numpy.ndarray
+        """
+        x = idx % WORLD_WIDTH
+        y = idx // WORLD_WIDTH
+        return numpy.array([x, y])
+
+    def get_room(self, coord):
+        """
+        :param (int,int)|numpy.ndarray coord:
+        :rtype: Room
+        """
+        return self.rooms[self.coord_to_idx(coord)]
+
+    def _register_player(self, player):
+        """
+        :param Entity player:
+        """
+        self.players_by_name[player.name][player] = None
+
+    def _unregister_player(self, player):
+        """
+        :param Entity player:
+        """
+        del self.players_by_name[player.name][player]
+
+    def _materialize_rooms_with(self, entity_names):
+        """
+        Makes sure that all the entities with these names are in the registry.
+
+        :param list[str] entity_names:
+        """
+        for room in self.rooms:
+            if not room.is_materialized() and room.has_any_entity_name(entity_names):
+                room.materialize()
+
+    def find_human_player(self):
+        """
+        :rtype: Entity|None
+        """
+        if not self.players_by_name[PLAYER_PIC]:
+            self._materialize_rooms_with([PLAYER_PIC])
+        return next(iter(self.players_by_name[PLAYER_PIC]), None)
+
+    def find_king(self):
+        """
+        :rtype: Entity|None
+        """
+        if not self.players_by_name[KING_PIC]:
+            self._materialize_rooms_with([KING_PIC])
+        return next(iter(self.players_by_name[KING_PIC]), None)
+
+    def find_robots(self):
+        """
+        :return: all robots in the world, including the king
+        :rtype: list[Entity]
+        """
+        self._materialize_rooms_with(ROBOT_PICS)
+        robots = []
+        for name in ROBOT_PICS:
+            robots.extend(self.players_by_name[name])
+        return robots
+
+    def set_king_vulnerable(self):
+        self._materialize_rooms_with([KING_PIC])
+        for king in self.players_by_name[KING_PIC]:
+            king.lives = 0
+
+    def finish_game(self):
+        for robot in self.find_robots():
+            robot.lives = 0
+            robot.kill()
+        for room in self.rooms:
+            places = []  # type: List[Place]
+            for entity in room.find_entities(WALL_PICS + DOOR_PICS):
+                if not places or places[-1] is not entity.place:
+                    places.append(entity.place)
+                entity.kill()
+            for place in places:
+                if place.is_free():
+                    place.set_entity(Entity(
+                        room=room,
+                        room_coord=place.coord,
+                        name=self.random.choice(SCORES_PICS)))
+
+    def _reset(self):
+        self._reset_diamonds()
+        for room in self.rooms:
+            room.load_tiles(None)
+
+    def load_empty(self):
+        self._reset()
+        self.snapshots.pop(SNAPSHOT_LOADED, None)
+        self.loaded_filename = None
+
+    def load(self, filename):
+        """
+        :param str filename: e.g. "robot.sce", or a full filename. See worldfile.FileExts.
+        """
+        from .worldfile import read_world_file
+        if "/" not in filename:
+            filename = find_game_file(filename)
+        data = read_world_file(filename)
+        self.set_data(data)
+        # set_data() copies, so the data itself can be kept as the snapshot
+        self.snapshots[SNAPSHOT_LOADED] = data
+        self.loaded_filename = filename
+
+    def take_snapshot(self, name):
+        """
+        Keeps a copy of the current state in memory (a few KB), to restore it later via restore_snapshot(),
+        which is much faster than saving and loading a file.
+
+        :param str name: e.g. SNAPSHOT_ROOM_ENTERED or "quick0"
+        """
+        self.snapshots[name] = self.get_data(with_game_state=self.find_human_player() is not None)
+
+    def has_snapshot(self, name):
+        """
+        :param str name:
+        :rtype: bool
+        """
+        return name in self.snapshots
+
+    def restore_snapshot(self, name):
+        """
+        Bulk copy of the snapshot into the rooms, like set_data().
+        The snapshot stays, so it can be restored again.
+        Simulation.restore_snapshot() also resets the simulation state.
+
+        :param str name:
+        """
+        self.set_data(self.snapshots[name])
+
+    def save(self, filename, directory=None, writer=None, callback=None):
+        """
+        :param str filename: e.g. "name.spi". See worldfile.FileExts.
+        :param str|None directory: GameDataDirs[0] by default
+        :param worldfile.AsyncWorldFileWriter|None writer: if given, only a snapshot is taken here,
+            and the file is written in the background
+        :param ((str,Exception|None)->None)|None callback: with writer, see AsyncWorldFileWriter.write()
+        """
+        from .worldfile import write_world_file, get_file_ext
+        assert "/" not in filename
+        name, file_ext = filename.rsplit(".", 1)
+        assert "\n" not in name
+        data = self.get_data(with_game_state=(get_file_ext(filename) != "sce"))
+        data.name = name
+        data.base_filename = os.path.basename(self.game.game_selected)  # only used for .spd
+        filename = (directory or GameDataDirs[0]) + "/" + filename
+        assert not os.path.exists(filename)
+        if not os.path.exists(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        if writer:
+            writer.write(filename, data, callback=callback)
+        else:
+            write_world_file(filename, data)
+
+    def set_data(self, data):
+        """
+        Replaces the whole world, without any interaction between the entities.
+
+        :param worldfile.WorldData data:
+        """
+        self._reset_diamonds()
+        for room in self.rooms:
+            room.load_tiles(data.tiles[room.idx])
+        if data.has_game_state:
+            player = self.find_human_player()
+            assert player, "no player"
+            player.scores = data.scores
+            player.lives = data.lives
+            player.knapsack.load_tiles(data.knapsack[:, None])
+            assert len(data.diamonds_activated) == len(self.diamonds_activated)
+            self.diamonds_activated[:] = data.diamonds_activated
+        if all(self.diamonds_activated):
+            self.set_king_vulnerable()
+
+    def get_data(self, with_game_state=True):
+        """
+        :param bool with_game_state: whether to include the state of the human player
+        :rtype: worldfile.WorldData
+        """
+        from .worldfile import WorldData
+        data = WorldData(tiles=self.tiles.copy(), has_game_state=with_game_state)
+        if with_game_state:
+            player = self.find_human_player()
+            assert player, "no player"
+            data.room_idx = self.game.cur_room.idx
+            data.scores = player.scores
+            data.lives = player.lives
+            data.diamonds_activated = list(self.diamonds_activated)
+            assert numpy.count_nonzero(player.knapsack.tiles[:, 1:]) == 0
+            data.knapsack = player.knapsack.tiles[:, 0].copy()
+        return data
+
+
+class RoomObserver:
+    """
+    Gets notified about changes in a room, e.g. to render it. See Room.observers.
+    """
+
+    def on_place_changed(self, place):
+        """
+        :param Place place: the entities of this place have changed
+        """
+        pass
+
+    def on_room_reset(self, room):
+        """
+        :param Room room: all the entities have been replaced, see Room.load_tiles()
+        """
+        pass
+
+
+class Room:
+    def __init__(self, world, idx=None, width=ROOM_WIDTH, height=ROOM_HEIGHT, screen_offset=(0, 0), tiles=None):
+        """
+        :param World world:
+        :param int|None idx: room idx in the world, such that world.rooms[idx] is self
+        :param int width: number of places in width
+        :param int height: number of places in height
+        :param (int,int) screen_offset: place-size screen offset
+        :param numpy.ndarray|None tiles: (width * height, PLACE_STACK_DEPTH) array, e.g. a view into World.tiles
+        """
+        self.world = world
+        self.idx = idx
+        self.screen_offset = numpy.array(screen_offset)
+        self.width = width
+        self.height = height
+        if tiles is None:
+            tiles = numpy.zeros((width * height, PLACE_STACK_DEPTH), dtype=TILE_DTYPE)
+        assert tiles.shape == (width * height, PLACE_STACK_DEPTH)
+        # place idx -> tile ids of the entities, bottom first, 0 = nothing. Kept in sync by Place.
+        self.tiles = tiles  # type: numpy.ndarray
+        # Index, kept in sync by Place. The entity dicts are used as ordered sets.
+        self.entities_by_name = {}  # type: Dict[str,Dict[Entity,None]]
+        self.free_place_idxs_heap = list(range(width * height))  # can contain outdated entries
+        # place idx -> whether it is in free_place_idxs_heap. Each place is at most once in the heap.
+        self.free_place_idxs_in_heap = [True] * (width * height)
+        self._places = None  # type: Optional[List[Place]]  # created on first use, see materialize()
+        self.selected_place = None  # type: Place
+        self.observers = []  # type: List[RoomObserver]
+        self.renderer = None  # type: Optional[RoomObserver]  # see render.get_room_renderer()
+        self.robot_passability = None  # type: Optional[RoomObserver]  # see robots.get_robot_passability()
+        self.last_tick = 0  # Simulation.ticks when this room was simulated the last time
+
+    def __repr__(self):
+        return "<Room idx=%r>" % (self.idx,)
+
+    @property
+    def places(self):
+        """
+        :rtype: list[Place]
+        """
+        if self._places is None:
+            self.materialize()
+        return self._places
+
+    def is_materialized(self):
+        """
+        :return: whether the Place and Entity objects exist. Otherwise there are only the tiles.
+        :rtype: bool
+        """
+        return self._places is not None
+
+    def materialize(self):
+        """
+        Creates the Place and Entity objects from the tiles, if that was not done yet.
+        This is done on first access, e.g. when the room gets visited or some rule touches it.
+        """
+        if self._places is not None:
+            return
+        tiles = self.tiles.copy()
+        self._places = [Place(room=self, idx=i) for i in range(self.width * self.height)]
+        for place_idx in numpy.flatnonzero(tiles[:, 0]).tolist():
+            place = self._places[place_idx]
+            for tile_id in tiles[place_idx].tolist():
+                if not tile_id:
+                    break
+                place._insert_entity(
+                    len(place.entities), Entity(room=self, room_coord=place.coord, name=TILE_NAMES[tile_id]))
+
+    @property
+    def world_coord(self):
+        x = self.idx % WORLD_WIDTH
+        y = self.idx // WORLD_WIDTH
+        return numpy.array((x, y))
+
+    def valid_coord(self, coord):
+        """
+        :param (int,int)|numpy.ndarray coord:
+        :rtype: bool
+        """
+        x, y = coord
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def coord_to_idx(self, coord):
+        """
+        :param (int,int)|numpy.ndarray coord:
+        :rtype: int
+        """
+        assert self.valid_coord(coord)
+        x, y = coord
+        return y * self.width + x
+
+    def idx_to_coord(self, idx):
+        """
+        :param int idx:
+        :return: (x,y) coord
+        :rtype: numpy.ndarray
+        """
+        x = idx % self.width
+        y = idx // self.width
+        return numpy.array([x, y])
+
+    def get_place(self, coord):
+        """
+        :param (int,int)|numpy.ndarray coord:
+        """
+        coord = numpy.array(coord)
+        if not self.valid_coord(coord):
+            assert self.idx is not None
+            world_size = numpy.array((WORLD_WIDTH, WORLD_HEIGHT))
+            room_size = numpy.array((self.width, self.height))
+            world_room_coord = self.world_coord * room_size + coord
+            world_room_coord %= world_size * room_size
+            world_coord = world_room_coord // room_size
+            coord = world_room_coord % room_size
+            room = self.world.get_room(world_coord)
+            assert room.valid_coord(coord)
+            return room.get_place(coord)
+        return self.places[self.coord_to_idx(coord)]
+
+    def load_tiles(self, tiles=None):
+        """
+        Replaces all entities, without any interaction between them.
+        The Place and Entity objects are created lazily, see materialize().
+
+        :param numpy.ndarray|None tiles: tile ids for each place, like self.tiles, or None for an empty room.
+          The stack depth can be smaller than PLACE_STACK_DEPTH.
+        """
+        if self._places is not None and self.idx is not None:
+            for name in PLAYER_PICS:
+                for player in self.entities_by_name.get(name, ()):
+                    self.world._unregister_player(player)
+        self._places = None
+        self.selected_place = None
+        self.entities_by_name = {}
+        self.free_place_idxs_heap = list(range(self.width * self.height))
+        self.free_place_idxs_in_heap = [True] * (self.width * self.height)
+        self.tiles[:] = 0
+        if tiles is not None:
+            self.tiles[:, :tiles.shape[1]] = tiles
+        for observer in self.observers:
+            observer.on_room_reset(self)
+
+    def reset_place(self, coord):
+        """
+        :param (int,int)|numpy.ndarray coord:
+        """
+        self.places[self.coord_to_idx(coord)].reset_entities()
+
+    def move_selection(self, relative):
+        """
+        :param numpy.ndarray relative:
+        """
+        coord = self.selected_place.coord + relative
+        if not self.valid_coord(coord):
+            return
+        self.selected_place = self.get_place(coord)
+
+    def count_entities(self):
+        """
+        :return: total number of entities in this room
+        :rtype: int
+        """
+        return int(numpy.count_nonzero(self.tiles))
+
+    def have_entity_name(self, name):
+        """
+        :param str name:
+        :return: whether we have an entity with this name
+        :rtype: bool
+        """
+        self.materialize()
+        return bool(self.entities_by_name.get(name))
+
+    def find_free_place(self):
+        """
+        :return: a place where there is no entity (the one with the lowest idx), or None
+        :rtype: None|Place
+        """
+        self.materialize()
+        heap = self.free_place_idxs_heap
+        while heap:
+            place = self.places[heap[0]]
+            if not place.entities:
+                return place
+            self.free_place_idxs_in_heap[heapq.heappop(heap)] = False
+        return None
+
+    def find_entities(self, entity_names):
+        """
+        :param list[str] entity_names:
+        :return: list of entities, ordered by place
+        :rtype: list[Entity]
+        """
+        self.materialize()
+        entities = []
+        for name in entity_names:
+            entities.extend(self.entities_by_name.get(name, ()))
+        if len(entities) > 1:
+            entities.sort(key=lambda entity: (entity.place.idx, entity.place.entities.index(entity)))
+        return entities
+
+    def _index_add_entity(self, entity):
+        """
+        :param Entity entity:
+        """
+        self.entities_by_name.setdefault(entity.name, {})[entity] = None
+        if self.idx is not None and entity.name in PLAYER_PICS:
+            self.world._register_player(entity)
+
+    def _index_remove_entity(self, entity):
+        """
+        :param Entity entity:
+        """
+        del self.entities_by_name[entity.name][entity]
+        if self.idx is not None and entity.name in PLAYER_PICS:
+            self.world._unregister_player(entity)
+
+    def _index_set_place_free(self, place):
+        """
+        :param Place place:
+        """
+        if not self.free_place_idxs_in_heap[place.idx]:
+            self.free_place_idxs_in_heap[place.idx] = True
+            heapq.heappush(self.free_place_idxs_heap, place.idx)
+
+    def on_place_changed(self, place):
+        """
+        :param Place place: the entities of this place have changed
+        """
+        for observer in self.observers:
+            observer.on_place_changed(place)
+
+    def has_any_entity_name(self, entity_names):
+        """
+        Like have_entity_name, but this only checks the tiles, and does not materialize the room.
+
+        :param list[str] entity_names:
+        :rtype: bool
+        """
+        tile_ids = [TILE_IDS[name] for name in entity_names if name in TILE_IDS]
+        return bool(numpy.isin(self.tiles, tile_ids).any())
+
+    def find_players(self):
+        return self.find_entities(PLAYER_PICS)
+
+    def find_robots(self):
+        return self.find_entities(ROBOT_PICS)
+
+
+class Place:
+    def __init__(self, room, idx):
+        """
+        :param Room room:
+        :param int idx:
+        """
+        self.room = room
+        self.idx = idx
+        self.entities = []  # type: List[Entity]
+
+    @property
+    def x(self):
+        return self.idx % self.room.width
+
+    @property
+    def y(self):
+        return self.idx // self.room.width
+
+    @property
+    def coord(self):
+        return numpy.array([self.x, self.y])
+
+    @property
+    def top_entity_name(self):
+        if self.entities:
+            return self.entities[-1].name
+        return BACKGROUND_PIC
+
+    @staticmethod
+    def normalize_name(name):
+        """
+        :param str name: e.g. "wand1.bmp" or "wand1.png" or "wand1"
+        :return: e.g. "wand1"
+        :rtype: str
+        """
+        if name.endswith(".bmp") or name.endswith(".png"):
+            name = name[:-4]
+        return name
+
+    def _update_tiles(self):
+        tiles = self.room.tiles[self.idx]
+        assert len(self.entities) <= len(tiles), "too many entities in %r" % self
+        tiles[:] = 0
+        for i, entity in enumerate(self.entities):
+            tiles[i] = entity.tile_id
+
+    def _insert_entity(self, idx, entity):
+        self.entities.insert(idx, entity)
+        self._update_tiles()
+        self.room._index_add_entity(entity)
+        self.room.on_place_changed(self)
+
+    def _remove_entity(self, entity):
+        self.entities.remove(entity)
+        self._update_tiles()
+        self.room._index_remove_entity(entity)
+        if not self.entities:
+            self.room._index_set_place_free(self)
+        self.room.on_place_changed(self)
+
+    def reset_entities(self):
+        for entity in list(self.entities):
+            self._remove_entity(entity)
+
+    def set_entity(self, entity):
+        """
+        :param Entity entity:
+        """
+        self.reset_entities()
+        if entity:
+            self.add_entity(entity)
+
+    def set_tiles(self, tile_ids):
+        """
+        Replaces all entities, without any interaction between them, like Room.load_tiles() for a single place.
+        The entities at the bottom which stay the same are kept, e.g. with their scores and knapsack.
+
+        :param list[int]|numpy.ndarray tile_ids: bottom first. 0 (or the end) means no further entity
+        """
+        tile_ids = [int(tile_id) for tile_id in tile_ids]
+        if 0 in tile_ids:
+            tile_ids = tile_ids[:tile_ids.index(0)]
+        num_kept = 0
+        while (num_kept < len(self.entities) and num_kept < len(tile_ids)
+               and self.entities[num_kept].tile_id == tile_ids[num_kept]):
+            num_kept += 1
+        for entity in self.entities[num_kept:]:
+            self._remove_entity(entity)
+        for tile_id in tile_ids[num_kept:]:
+            self._insert_entity(
+                len(self.entities), Entity(room=self.room, room_coord=self.coord, name=TILE_NAMES[tile_id]))
+
+    def add_entity(self, entity):
+        """
+        :param Entity entity:
+        """
+        self._insert_entity(len(self.entities), entity)
+        self.on_add_entity()
+
+    def insert_entity_below(self, entity):
+        """
+        Puts the entity at the bottom, without any interaction (e.g. the place under the player).
+
+        :param Entity entity:
+        """
+        self._insert_entity(0, entity)
+
+    def remove_entity(self, entity):
+        """
+        :param Entity entity:
+        """
+        self._remove_entity(entity)
+
+    def is_free(self):
+        return not self.entities
+
+    def is_allowed_to_add_entity(self, entity):
+        """
+        :param Entity entity:
+        :rtype: bool
+        """
+        return is_allowed_together(self.entities + [entity])
+
+    def on_add_entity(self):
+        on_joined_together(self.entities)
+
+    def is_at_room_border(self):
+        if self.x in (0, self.room.width - 1):
+            return True
+        if self.y in (0, self.room.height - 1):
+            return True
+        return False
+
+    def nearby_places(self, allow_room_borders=False):
+        """
+        :param bool allow_room_borders:
+        :return: list of places in this room
+        :rtype: list[Place]
+        """
+        places = []
+        room_borders = [[0, self.room.width - 1], [0, self.room.height - 1]]
+        if not allow_room_borders:
+            for b in room_borders:
+                b[0] += 1
+                b[1] -= 1
+        for rel in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+            coord = self.coord + numpy.array(rel)
+            if coord[0] < room_borders[0][0] or coord[0] > room_borders[0][1]:
+                continue
+            if coord[1] < room_borders[1][0] or coord[1] > room_borders[1][1]:
+                continue
+            places.append(self.room.get_place(coord))
+        return places
+
+    def nearby_entities(self, include_room_borders=False):
+        """
+        :param bool include_room_borders:
+        :return: list of entities
+        :rtype: list[Entity]
+        """
+        entities = []
+        for place in self.nearby_places(allow_room_borders=include_room_borders):
+            entities.extend(reversed(place.entities))
+        return entities
+
+
+class Entity:
+    def __init__(self, room, room_coord, name):
+        """
+        :param Room room:
+        :param numpy.ndarray room_coord:
+        :param str name: e.g. "figur"
+        """
+        self.room = room
+        self.room_coord = room_coord
+        self.name = name
+        self.tile_id = get_tile_id(name)
+        self.knapsack = None  # type: Optional[Room]
+        if name == PLAYER_PIC:
+            self.knapsack = Room(
+                world=room.world,
+                width=KNAPSACK_WIDTH, height=KNAPSACK_HEIGHT,
+                screen_offset=(ROOM_WIDTH + 1, 0))
+        self.scores = 0
+        if name == PLAYER_PIC:
+            self.lives = 3
+        elif name == KING_PIC:
+            self.lives = float("inf")
+        else:
+            self.lives = 0
+        self.is_alive = True
+
+    def __repr__(self):
+        return "<Entity %r in room %r in place %r>" % (
+            self.name, self.room, tuple(self.room_coord))
+
+    def is_at_room_edge(self):
+        if self.room_coord[0] in (0, self.room.width - 1):
+            return True
+        if self.room_coord[1] in (0, self.room.height -1):
+            return True
+        return False
+
+    @property
+    def place(self):
+        return self.room.get_place(self.room_coord)
+
+    def can_move(self, relative):
+        """
+        :param numpy.ndarray relative: (x,y)
+        """
+        if not self.is_alive:
+            return False
+        new_coord = self.room_coord + relative
+        if not self.room.valid_coord(new_coord):
+            return True  # we will just always switch to a new room in this case
+        if not self.room.get_place(new_coord).is_allowed_to_add_entity(self):
+            return False
+        return True
+
+    def move(self, relative):
+        """
+        :param numpy.ndarray relative: (x,y)
+        """
+        if not self.can_move(relative):
+            return
+        self.move_to_place(self.room.get_place(self.room_coord + relative))
+
+    def move_to_place(self, place):
+        """
+        :param Place place:
+        """
+        self.place.remove_entity(self)
+        self.room = place.room
+        self.room_coord = place.coord
+        place.add_entity(self)
+
+    def kill(self):
+        if self.lives > 0:
+            self.lives -= 1
+            return
+        if self is self.room.world.game.human_player:
+            self.room.world.game.set_info_text("Very sad, you are dead.")
+        if self.name == KING_PIC:
+            self.room.world.game.set_info_text("The king is dead!")
+            self.room.world.game.recheck_finished_game = True
+        self.place.remove_entity(self)
+        self.is_alive = False
+
+
+def get_tile_id(name):
+    """
+    :param str name: e.g. "figur"
+    :return: tile id, see TILE_NAMES. Unknown names get registered.
+    :rtype: int
+    """
+    tile_id = TILE_IDS.get(name)
+    if tile_id is not None:
+        return tile_id
+    with _tile_ids_lock:
+        tile_id = TILE_IDS.get(name)  # maybe registered by another thread meanwhile
+        if tile_id is None:
+            tile_id = len(TILE_NAMES)
+            assert tile_id <= numpy.iinfo(TILE_DTYPE).max, "too many different tiles"
+            # First the name, such that any thread which finds the id also finds the name.
+            TILE_NAMES.append(name)
+            TILE_IDS[name] = tile_id
+    return tile_id
+
+
+def is_allowed_together(entities):
+    """
+    :param list[Entity] entities:
+    :rtype: bool
+    """
+    if len(entities) <= 1:
+        return True
+    robots = [entity for entity in entities if entity.name in ROBOT_PICS]
+    if len(robots) > 1:
+        return False
+    game = entities[0].room.world.game
+    if game.Compatibility1999:
+        # This is only for game-state compatibility with older versions,
+        # and with the saved games format.
+        if robots:
+            remaining = [e for e in entities if e.name not in ROBOT_PICS]
+            # Now remove all which are allowed together with robots.
+            # The only reason they are not allowed is because we couldn't save such a state.
+            remaining = [e for e in remaining if e.name != PLAYER_PIC]
+            remaining = [e for e in remaining if e.name != ELECTRIC_WALL_PIC]
+            if remaining:  # Still any which are not allowed together?
+                return False
+    entity_names_map = {}  # type: Dict[str,List[Entity]]
+    for entity in entities:
+        entity_names_map.setdefault(entity.name, [])
+        entity_names_map[entity.name].append(entity)
+    if any(["wand%i" % i in entity_names_map for i in range(1, 3)]):
+        return False
+    if any(["code%i" % i in entity_names_map for i in range(1, 4)]):
+        return False
+    doors = [door for door in DOOR_PICS if door in entity_names_map]
+    if doors:
+        if len(doors) > 1:
+            return False
+        door_name = doors[0]
+        door = entity_names_map[door_name][0]
+        if door.is_at_room_edge() and door.room.find_robots():
+            # special rule: nothing can pass any door at an edge if there are robots alive
+            return False
+        door_idx = DOOR_PICS.index(door_name)
+        door_key = KEY_PICS[door_idx]
+        for entity in entities:
+            if entity.name == door_name:
+                continue
+            if not entity.knapsack:
+                return False
+            if not entity.knapsack.have_entity_name(door_key):
+                return False
+        return True
+    return True
+
+
+def on_joined_together(entities):
+    """
+    :param list[Entity] entities:
+    """
+    if len(entities) <= 1:
+        return
+    electric_walls = [entity for entity in entities if entity.name == ELECTRIC_WALL_PIC]
+    players = [entity for entity in entities if entity.name in PLAYER_PICS]
+    while players and electric_walls:
+        for player in players:
+            if not electric_walls:
+                break
+            electro_wall = electric_walls[0]
+            electro_wall.kill()
+            player.kill()
+            if not electro_wall.is_alive:
+                electric_walls.remove(electro_wall)
+            if not player.is_alive:
+                players.remove(player)
+    human_players = [entity for entity in players if entity.name == PLAYER_PIC]
+    robots = [entity for entity in players if entity.name != PLAYER_PIC]
+    while human_players and robots:
+        human = human_players[0]
+        robot = robots[0]
+        robot.kill()
+        human.kill()
+        if not robot.is_alive or robot.lives == float("inf"):
+            robots.remove(robot)
+        if not human.is_alive or human.lives == float("inf"):
+            human_players.remove(human)
+    points = [entity for entity in entities if entity.name in SCORES_PICS]
+    while human_players and points:
+        for human in human_players:
+            if not points:
+                break
+            point = points[0]
+            human.scores += 1000
+            point.kill()
+            if not point.is_alive:
+                points.remove(point)
+    collectable = [entity for entity in entities if entity.name in COLLECTABLE_PICS]
+    collecting_humans = list(human_players)
+    while collecting_humans and collectable:
+        for human in list(collecting_humans):
+            if not collectable:
+                break
+            place = human.knapsack.find_free_place()
+            if not place:
+                human.room.world.game.set_info_text("No free place in your knapsack.")
+                collecting_humans.remove(human)
+                continue
+            item = collectable.pop(0)
+            item.move_to_place(place)
+    kill_switches = [entity for entity in entities if entity.name == KILL_PIC]
+    if human_players and kill_switches:
+        for kill in kill_switches:
+            for robot in kill.room.find_entities(ROBOT_PICS):
+                robot.kill()
+            kill.kill()
+
+
+def do_robot_action(robot, human):
+    """
+    :param Entity robot:
+    :param Entity human:
+    """
+    relative = numpy.clip(human.room_coord - robot.room_coord, -1, 1)
+    dirs = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    robot.room.world.random.shuffle(dirs)
+    dirs = [numpy.array(d) for d in dirs]
+    # First try to move in any direction like the human player.
+    for d in dirs:
+        if not robot.can_move(d):
+            continue
+        for i in (0, 1):
+            if relative[i] and relative[i] == d[i]:
+                robot.move(d)
+                return
+    # Now try to move in any direction.
+    for d in dirs:
+        if robot.can_move(d):
+            robot.move(d)
+            return
+    # This will fail but show some intention.
+    robot.move(dirs[0])
+
+
+def do_item_action(player, item):
+    """
+    :param Entity player:
+    :param Entity item:
+    """
+    print("%r do item %r action" % (player.name, item.name))
+    if item.name == BURN_PIC:
+        count = 0
+        for entity in player.place.nearby_entities(include_room_borders=False):
+            if entity.name in BURNABLE_PICS:
+                entity.kill()
+                count += 1
+        if count > 0:
+            item.kill()
+        else:
+            player.room.world.game.set_info_text("Cannot burn anything here.")
+    elif item.name == GET_LIVE_PIC:
+        player.lives += 1
+        player.room.world.game.set_info_text("You got an extra live.")
+        item.kill()
+    elif item.name in KEY_PICS:
+        player.room.world.game.set_info_text("A key has no action. But you can go through doors.")
+    elif item.name in DIAMOND_PICS:
+        count = 0
+        diamond_idx = DIAMOND_PICS.index(item.name)
+        for entity in player.place.nearby_entities(include_room_borders=True):
+            if entity.name == CODE_PICS[diamond_idx]:
+                count += 1
+                entity.kill()
+                item.kill()
+                player.room.world.diamonds_activated[diamond_idx] = True
+                break
+        if count:
+            rem = len(player.room.world.diamonds_activated) - sum(player.room.world.diamonds_activated)
+            if rem > 0:
+                player.room.world.game.set_info_text("%i diamonds remaining." % rem)
+            else:
+                player.room.world.game.set_info_text("You finished it. The king is vulnerable.")
+                player.room.world.set_king_vulnerable()
+        else:
+            player.room.world.game.set_info_text("The diamond can not be used here.")
+    else:
+        print("no action implemented for item %r" % item.name)
+
+
+def find_game_file(filename, assert_exists=True):
+    """
+    :param str filename: e.g. "game.sce"
+    :param bool assert_exists:
+    :return: full filename, e.g. GAME_DATA_DIR + "/game.sce"
+    :rtype: str|None
+    """
+    for d in GameDataDirs:
+        full_fn = "%s/%s" % (d, filename)
+        if os.path.exists(full_fn):
+            return full_fn
+    if assert_exists:
+        raise Exception("Did not found game file: %s" % filename)
+    return None
+
+
+def get_unique_game_file(filename, taken=None):
+    """
+    :param str filename: eg. "game.spi"
+    :param set[str]|None taken: file names which are treated as existing, e.g. Simulation.get_pending_saves()
+    :return: filename which does not exists in GameDataDirs, e.g. "game.spi" or "game_1.spi" or so
+    :rtype: str
+    """
+    assert "/" not in filename
+    base, file_ext = os.path.splitext(filename)
+    count = 0
+    while True:
+        if not count:
+            postfix = ""
+        else:
+            postfix = "_%i" % count
+        name = base + postfix + file_ext
+        if not find_game_file(name, assert_exists=False) and name not in (taken or ()):
+            return name
+        count += 1
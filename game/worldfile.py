@@ -0,0 +1,636 @@
+
+import os
+import re
+import mmap
+import queue
+import hashlib
+import struct
+import threading
+import numpy
+from collections import deque
+from typing import Set, Deque, Dict, Tuple, Optional
+from .world import TILE_NAMES, TILE_DTYPE, PLACE_STACK_DEPTH, get_tile_id
+from .world import WORLD_WIDTH, WORLD_HEIGHT, ROOM_WIDTH, ROOM_HEIGHT, KNAPSACK_MAX
+from .world import BACKGROUND_PIC, SAVE_PIC, PLAYER_PIC, DIAMOND_PICS, Place
+
+
+# sce -> just the world rooms
+# spi -> full game state
+# spb -> binary, optionally with the game state. See read_binary_world_file().
+# spd -> binary, only the difference to a base scenario. See read_delta_world_file().
+LegacyFileExts = ("sce", "spi")
+BinaryFileExt = "spb"
+DeltaFileExt = "spd"
+FileExts = LegacyFileExts + (BinaryFileExt, DeltaFileExt)
+
+# We treat background just as nothing.
+# We also ignore the save mechanism and allow to save always via the menu.
+BackgroundPics = (BACKGROUND_PIC, SAVE_PIC, "")
+
+BinaryMagic = b"POGW"
+BinaryVersion = 1
+BinaryFlagGameState = 1
+# magic, version, flags,
+# world width, world height, room width, room height, place stack depth, knapsack max, room idx, number of diamonds,
+# scores, lives, diamonds activated, name, number of tile names
+BinaryHeader = struct.Struct("<4sHH8Bqq%iB64sH" % len(DIAMOND_PICS))
+BinaryNameSize = 64  # of the name (and of the base file name in DeltaHeader), in UTF-8 bytes
+BinaryTileNameSize = 16
+
+DeltaMagic = b"POGD"
+DeltaVersion = 1
+# Like BinaryHeader, and after the name:
+# base file name, base content hash (see get_world_content_hash()), number of tile names, number of changed places
+DeltaHeader = struct.Struct("<4sHH8Bqq%iB64s64s20sHI" % len(DIAMOND_PICS))
+DeltaPlaceIdxDtype = numpy.dtype("<u4")  # room idx * places per room + place idx
+
+
+class WorldData:
+    """
+    The content of a world file, i.e. all the rooms,
+    and, if has_game_state, also the state of the human player.
+    Tile ids are as in world.TILE_NAMES.
+    The place under the player is just part of the tile stack of the player place.
+    """
+
+    def __init__(self, tiles=None, has_game_state=False):
+        """
+        :param numpy.ndarray|None tiles: like World.tiles
+        :param bool has_game_state:
+        """
+        if tiles is None:
+            tiles = numpy.zeros(
+                (WORLD_WIDTH * WORLD_HEIGHT, ROOM_WIDTH * ROOM_HEIGHT, PLACE_STACK_DEPTH), dtype=TILE_DTYPE)
+        self.tiles = tiles
+        self.has_game_state = has_game_state
+        self.room_idx = 0
+        self.name = ""
+        self.scores = 0
+        self.lives = 3
+        self.diamonds_activated = [False] * len(DIAMOND_PICS)
+        self.knapsack = numpy.zeros((KNAPSACK_MAX,), dtype=TILE_DTYPE)
+        self.base_filename = ""  # for .spd: the scenario which this is relative to, e.g. "robot.sce"
+
+    def find_human_player_place(self):
+        """
+        :return: (room idx, place idx) of the (first) human player, or None
+        :rtype: (int,int)|None
+        """
+        idxs = numpy.argwhere((self.tiles == get_tile_id(PLAYER_PIC)).any(axis=2))
+        if len(idxs) == 0:
+            return None
+        room_idx, place_idx = idxs[0]
+        return int(room_idx), int(place_idx)
+
+    def get_top_tiles(self):
+        """
+        :return: the top tile id of every place, 0 where there is nothing. shape (num rooms, num places)
+        :rtype: numpy.ndarray
+        """
+        counts = numpy.count_nonzero(self.tiles, axis=2)
+        top = numpy.take_along_axis(self.tiles, numpy.maximum(counts - 1, 0)[:, :, None], axis=2)[:, :, 0]
+        return top
+
+
+def get_file_ext(filename):
+    """
+    :param str filename:
+    :return: e.g. "spi"
+    :rtype: str
+    """
+    return filename.rsplit(".", 1)[-1].lower()
+
+
+def read_world_file(filename):
+    """
+    :param str filename: full filename
+    :rtype: WorldData
+    """
+    file_ext = get_file_ext(filename)
+    assert file_ext in FileExts, "unknown file type: %s" % filename
+    if file_ext == BinaryFileExt:
+        return read_binary_world_file(filename)
+    if file_ext == DeltaFileExt:
+        return read_delta_world_file(filename)
+    return read_legacy_world_file(filename)
+
+
+def write_world_file(filename, data):
+    """
+    The file is written under a temporary name first, synced to disk, and then renamed,
+    such that there is never a partially written file, e.g. when the game crashes while saving.
+
+    :param str filename: full filename
+    :param WorldData data:
+    """
+    file_ext = get_file_ext(filename)
+    assert file_ext in FileExts, "unknown file type: %s" % filename
+    tmp_filename = "%s.%i.tmp" % (filename, os.getpid())
+    try:
+        if file_ext in (BinaryFileExt, DeltaFileExt):
+            with open(tmp_filename, "wb") as f:
+                if file_ext == BinaryFileExt:
+                    write_binary_world_data(f, data)
+                else:
+                    write_delta_world_data(f, data)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            assert data.has_game_state == (file_ext == "spi")
+            with open(tmp_filename, "w") as f:
+                f.write(format_legacy_world_data(data))
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+    if hasattr(os, "O_DIRECTORY"):  # make the rename itself durable. not possible on Windows
+        dir_fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class AsyncWorldFileWriter:
+    """
+    Writes world files via write_world_file() (or another write function, e.g. into the save store)
+    in a worker thread, one after another.
+    The data must not be modified after write(), so it should be a snapshot, like from World.get_data().
+    The callbacks are called in the thread which calls poll(), i.e. usually the main thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = set()  # type: Set[str]  # filenames which are not written yet
+        self.finished = deque()  # type: Deque[Tuple[str,Optional[Exception],object]]  # filename, error, callback
+        self._queue = queue.Queue()  # type: queue.Queue
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def write(self, filename, data, callback=None, write_func=None):
+        """
+        :param str filename: full filename. or any other unique key of the target, for write_func
+        :param WorldData data: snapshot
+        :param ((str,Exception|None)->None)|None callback: called via poll() when done,
+            with the filename and the error, if there was one
+        :param ((str,WorldData)->None)|None write_func: write_world_file by default. called in the worker thread
+        """
+        with self.lock:
+            assert filename not in self.pending, "already being written: %s" % filename
+            self.pending.add(filename)
+        self._queue.put((filename, data, callback, write_func or write_world_file))
+        if not self._thread:
+            self._thread = threading.Thread(target=self._thread_main, name="AsyncWorldFileWriter", daemon=True)
+            self._thread.start()
+
+    def _thread_main(self):
+        while True:
+            filename, data, callback, write_func = self._queue.get()
+            error = None
+            try:
+                write_func(filename, data)
+            except Exception as exc:
+                error = exc
+            with self.lock:
+                self.pending.remove(filename)
+                self.finished.append((filename, error, callback))
+            self._queue.task_done()
+
+    def is_pending(self, filename):
+        """
+        :param str filename: full filename
+        :rtype: bool
+        """
+        with self.lock:
+            return filename in self.pending
+
+    def poll(self):
+        """
+        Calls the callbacks of the finished writes.
+        A failed write without callback raises its error here.
+        """
+        while True:
+            with self.lock:
+                if not self.finished:
+                    return
+                filename, error, callback = self.finished.popleft()
+            if callback:
+                callback(filename, error)
+            elif error:
+                raise error
+
+    def wait(self):
+        """
+        Waits until all files are written, e.g. before the game exits, and then calls poll().
+        """
+        self._queue.join()
+        self.poll()
+
+
+def read_legacy_world_file(filename):
+    """
+    :param str filename: .sce or .spi
+    :rtype: WorldData
+    """
+    file_ext = get_file_ext(filename)
+    assert file_ext in LegacyFileExts
+    lines = open(filename).read().splitlines()
+    return parse_legacy_world_data(lines, has_game_state=(file_ext == "spi"))
+
+
+def _legacy_tile_id(line, cache):
+    """
+    :param str line: e.g. "wand1.bmp"
+    :param dict[str,int] cache: line -> tile id
+    :rtype: int
+    """
+    tile_id = cache.get(line)
+    if tile_id is None:
+        name = Place.normalize_name(line)
+        tile_id = 0 if name in BackgroundPics else get_tile_id(name)
+        cache[line] = tile_id
+    return tile_id
+
+
+def parse_legacy_world_data(lines, has_game_state):
+    """
+    :param list[str] lines:
+    :param bool has_game_state: spi (True) or sce (False)
+    :rtype: WorldData
+    """
+    """
+    file content (for full game state):
+    [Room-Nr]
+    [Name]
+    [Scores]
+    [Life]
+    [Diamond status 1]
+    [Diamond status 2]
+    [Diamond status 3]
+    [Place under player]
+    :RUCK
+    bild1.bmp
+    ...
+    :RAUM1
+    bild1.bmp
+    bild2.bmp
+    ...
+    :RAUM2
+    ...
+    :RAUM20
+    ...
+    """
+    data = WorldData(has_game_state=has_game_state)
+    cache = {}  # line -> tile id
+    num_places = ROOM_WIDTH * ROOM_HEIGHT
+    line_idx = 0
+    if has_game_state:
+        assert lines[8] == ":RUCK"
+        line_idx = 9 + KNAPSACK_MAX + 1
+        assert lines[line_idx - 1] == "ENDE"
+    loaded_rooms_idxs = set()
+    while line_idx < len(lines):
+        l = lines[line_idx]
+        line_idx += 1
+        if not l:
+            continue
+        m = re.match(r":RAUM([0-9]+)", l, flags=re.IGNORECASE)
+        assert m, "did not expect %r" % l
+        room_idx = int(m.groups()[0]) - 1
+        assert 0 <= room_idx < WORLD_WIDTH * WORLD_HEIGHT
+        assert room_idx not in loaded_rooms_idxs
+        loaded_rooms_idxs.add(room_idx)
+        room_lines = lines[line_idx:line_idx + num_places]
+        assert len(room_lines) == num_places, "last room incomplete"
+        data.tiles[room_idx, :, 0] = [_legacy_tile_id(l, cache) for l in room_lines]
+        line_idx += num_places
+    assert len(loaded_rooms_idxs) == WORLD_WIDTH * WORLD_HEIGHT, "some room is missing"
+    if has_game_state:
+        data.room_idx = int(lines[0] or 0)
+        data.name = lines[1]
+        data.scores = int(lines[2])
+        data.lives = int(lines[3])
+        assert len(DIAMOND_PICS) == len(data.diamonds_activated) == 3
+        for i in range(3):
+            data.diamonds_activated[i] = bool(int(lines[4 + i]))
+        player_place = data.find_human_player_place()
+        assert player_place, "no player"
+        place_under_player = _legacy_tile_id(lines[7], cache)
+        if place_under_player:
+            data.tiles[player_place][1] = data.tiles[player_place][0]
+            data.tiles[player_place][0] = place_under_player
+        data.knapsack[:] = [_legacy_tile_id(l, cache) for l in lines[9:9 + KNAPSACK_MAX]]
+    return data
+
+
+def format_legacy_world_data(data):
+    """
+    :param WorldData data:
+    :return: content of the .sce or .spi file
+    :rtype: str
+    """
+    names = ["%s.bmp" % name for name in TILE_NAMES]
+    names[0] = "%s.bmp" % BACKGROUND_PIC
+    lines = []
+    if data.has_game_state:
+        player_place = data.find_human_player_place()
+        assert player_place, "no player"
+        player_stack = data.tiles[player_place]
+        lines.append("%i" % data.room_idx)  # room-nr
+        lines.append(data.name)
+        lines.append("%i" % data.scores)
+        lines.append("%i" % data.lives)
+        assert len(DIAMOND_PICS) == len(data.diamonds_activated) == 3
+        for i in range(3):
+            lines.append("%i" % int(data.diamonds_activated[i]))
+        if numpy.count_nonzero(player_stack) >= 2:
+            assert numpy.count_nonzero(player_stack) == 2
+            lines.append(names[player_stack[0]])  # place under player
+        else:
+            lines.append("")  # place under player (nothing)
+        lines.append(":RUCK")
+        assert len(data.knapsack) == KNAPSACK_MAX
+        lines.extend([names[tile_id] if tile_id else "" for tile_id in data.knapsack.tolist()])
+        lines.append("ENDE")
+    top_tiles = data.get_top_tiles()
+    assert len(top_tiles) == WORLD_WIDTH * WORLD_HEIGHT
+    for room_idx, room_top_tiles in enumerate(top_tiles.tolist()):
+        lines.append(":RAUM%i" % (room_idx + 1))
+        lines.extend([names[tile_id] for tile_id in room_top_tiles])
+    return "".join([l + "\n" for l in lines])
+
+
+def read_binary_world_file(filename):
+    """
+    The file is mapped into memory, and the tile arrays are NumPy views on it,
+    unless the tile ids of the file need to be translated.
+
+    :param str filename: .spb
+    :rtype: WorldData
+    """
+    with open(filename, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data, _ = read_binary_world_data(buf, filename=filename)
+    return data
+
+
+def read_binary_world_data(buf, offset=0, filename="<buffer>"):
+    """
+    Like read_binary_world_file(), but from a buffer, e.g. when the world is embedded in another file.
+
+    :param bytes|mmap.mmap|memoryview buf:
+    :param int offset: where the world data starts in buf
+    :param str filename: for error messages
+    :return: data, offset after the world data
+    :rtype: (WorldData, int)
+    """
+    header = BinaryHeader.unpack_from(buf, offset)
+    (magic, version, flags,
+     world_width, world_height, room_width, room_height, stack_depth, knapsack_max, room_idx, num_diamonds,
+     scores, lives) = header[:13]
+    diamonds = header[13:-2]
+    name, num_tile_names = header[-2:]
+    assert magic == BinaryMagic, "not a world file: %s" % filename
+    assert version == BinaryVersion, "unsupported version %i: %s" % (version, filename)
+    assert (world_width, world_height, room_width, room_height) == (
+        WORLD_WIDTH, WORLD_HEIGHT, ROOM_WIDTH, ROOM_HEIGHT), "unsupported world size: %s" % filename
+    assert stack_depth == PLACE_STACK_DEPTH and knapsack_max == KNAPSACK_MAX and num_diamonds == len(DIAMOND_PICS)
+    offset += BinaryHeader.size
+    tile_ids, offset = _read_tile_names(buf, offset, num_tile_names)
+    knapsack = numpy.frombuffer(buf, dtype=TILE_DTYPE, count=KNAPSACK_MAX, offset=offset)
+    offset += KNAPSACK_MAX
+    shape = (WORLD_WIDTH * WORLD_HEIGHT, ROOM_WIDTH * ROOM_HEIGHT, PLACE_STACK_DEPTH)
+    tiles = numpy.frombuffer(buf, dtype=TILE_DTYPE, count=int(numpy.prod(shape)), offset=offset).reshape(shape)
+    offset += tiles.size
+    _check_tile_ids(tile_ids, (knapsack, tiles), filename=filename)
+    if not numpy.array_equal(tile_ids, numpy.arange(len(tile_ids))):
+        tiles = tile_ids[tiles]
+        knapsack = tile_ids[knapsack]
+    data = WorldData(tiles=tiles, has_game_state=bool(flags & BinaryFlagGameState))
+    data.knapsack = knapsack
+    data.room_idx = room_idx
+    data.name = _decode_name(name)
+    data.scores = scores
+    data.lives = lives
+    data.diamonds_activated = [bool(d) for d in diamonds]
+    return data, offset
+
+
+def write_binary_world_file(filename, data):
+    """
+    :param str filename: .spb
+    :param WorldData data:
+    """
+    with open(filename, "wb") as f:
+        write_binary_world_data(f, data)
+
+
+def write_binary_world_data(f, data):
+    """
+    :param typing.BinaryIO f: file opened for writing, e.g. also io.BytesIO
+    :param WorldData data:
+    """
+    used_tile_names = TILE_NAMES[:max(int(data.tiles.max()), int(data.knapsack.max())) + 1]
+    header = BinaryHeader.pack(
+        BinaryMagic, BinaryVersion, BinaryFlagGameState if data.has_game_state else 0,
+        WORLD_WIDTH, WORLD_HEIGHT, ROOM_WIDTH, ROOM_HEIGHT, PLACE_STACK_DEPTH, KNAPSACK_MAX,
+        data.room_idx, len(DIAMOND_PICS),
+        data.scores, data.lives, *[int(d) for d in data.diamonds_activated],
+        _encode_name(data.name), len(used_tile_names))
+    f.write(header)
+    _write_tile_names(f, used_tile_names)
+    f.write(numpy.ascontiguousarray(data.knapsack, dtype=TILE_DTYPE).tobytes())
+    f.write(numpy.ascontiguousarray(data.tiles, dtype=TILE_DTYPE).tobytes())
+
+
+def _read_tile_names(buf, offset, num_tile_names):
+    """
+    :param bytes|mmap.mmap|memoryview buf:
+    :param int offset:
+    :param int num_tile_names:
+    :return: tile id in the file -> tile id in TILE_NAMES, offset after the tile names
+    :rtype: (numpy.ndarray, int)
+    """
+    file_tile_names = []
+    for i in range(num_tile_names):
+        file_tile_names.append(bytes(buf[offset:offset + BinaryTileNameSize]).rstrip(b"\0").decode("utf8"))
+        offset += BinaryTileNameSize
+    tile_ids = numpy.array([0] + [get_tile_id(n) for n in file_tile_names[1:]], dtype=TILE_DTYPE)
+    return tile_ids, offset
+
+
+def _check_tile_ids(tile_ids, arrays, filename):
+    """
+    :param numpy.ndarray tile_ids: from _read_tile_names()
+    :param list[numpy.ndarray]|tuple[numpy.ndarray] arrays: with tile ids of the file
+    :param str filename: for error messages
+    """
+    for array in arrays:
+        assert array.size == 0 or int(array.max()) < len(tile_ids), "invalid tile id: %s" % filename
+
+
+def _encode_name(name):
+    """
+    :param str name:
+    :return: UTF-8, truncated to BinaryNameSize bytes, but not within a multi-byte character
+    :rtype: bytes
+    """
+    return name.encode("utf8")[:BinaryNameSize].decode("utf8", errors="ignore").encode("utf8")
+
+
+def _decode_name(name):
+    """
+    :param bytes name: see _encode_name()
+    :rtype: str
+    """
+    return name.rstrip(b"\0").decode("utf8", errors="ignore")
+
+
+def _write_tile_names(f, tile_names):
+    """
+    :param typing.BinaryIO f:
+    :param list[str] tile_names:
+    """
+    for name in tile_names:
+        name = name.encode("utf8")
+        assert len(name) <= BinaryTileNameSize
+        f.write(name.ljust(BinaryTileNameSize, b"\0"))
+
+
+def get_world_content_hash(data):
+    """
+    :param WorldData data: e.g. of a scenario
+    :return: SHA1 of the rooms (without the game state), independent of the file format,
+        and also of the tile ids, which depend on what was loaded before (see world.get_tile_id())
+    :rtype: bytes
+    """
+    tiles = numpy.asarray(data.tiles)
+    # Canonical ids: the index of the name in the sorted names of the used tiles.
+    used_ids = numpy.unique(tiles).tolist()
+    names = sorted(TILE_NAMES[tile_id] for tile_id in used_ids)
+    canonical_ids = numpy.zeros((max(used_ids) + 1,), dtype=TILE_DTYPE)
+    for tile_id in used_ids:
+        canonical_ids[tile_id] = names.index(TILE_NAMES[tile_id])
+    h = hashlib.sha1()
+    h.update("\n".join(names).encode("utf8"))
+    h.update(numpy.ascontiguousarray(canonical_ids[tiles]).tobytes())
+    return h.digest()
+
+
+# full filename -> (mtime, data, content hash). See get_base_world_data().
+_base_world_data_cache = {}  # type: Dict[str,Tuple[float,WorldData,bytes]]
+_base_world_data_lock = threading.Lock()  # also used by the AsyncWorldFileWriter thread
+
+
+def get_base_world_data(base_filename):
+    """
+    The base of a delta world file. It is only read again when the file changed.
+
+    :param str base_filename: e.g. "robot.sce", see world.find_game_file()
+    :return: data (must not be modified), content hash
+    :rtype: (WorldData, bytes)
+    """
+    from .world import find_game_file
+    filename = find_game_file(base_filename)
+    mtime = os.path.getmtime(filename)
+    with _base_world_data_lock:
+        cached = _base_world_data_cache.get(filename)
+        if not cached or cached[0] != mtime:
+            data = read_world_file(filename)
+            cached = (mtime, data, get_world_content_hash(data))
+            _base_world_data_cache[filename] = cached
+    return cached[1], cached[2]
+
+
+def read_delta_world_file(filename):
+    """
+    A delta world file only has the game state and the places which differ from its base scenario
+    (data.base_filename), which must not have changed since then (the content hash is checked).
+
+    :param str filename: .spd
+    :rtype: WorldData
+    """
+    buf = open(filename, "rb").read()
+    header = DeltaHeader.unpack_from(buf)
+    (magic, version, flags,
+     world_width, world_height, room_width, room_height, stack_depth, knapsack_max, room_idx, num_diamonds,
+     scores, lives) = header[:13]
+    diamonds = header[13:-5]
+    name, base_filename, base_hash, num_tile_names, num_changed = header[-5:]
+    assert magic == DeltaMagic, "not a delta world file: %s" % filename
+    assert version == DeltaVersion, "unsupported version %i: %s" % (version, filename)
+    assert (world_width, world_height, room_width, room_height) == (
+        WORLD_WIDTH, WORLD_HEIGHT, ROOM_WIDTH, ROOM_HEIGHT), "unsupported world size: %s" % filename
+    assert stack_depth == PLACE_STACK_DEPTH and knapsack_max == KNAPSACK_MAX and num_diamonds == len(DIAMOND_PICS)
+    base_filename = _decode_name(base_filename)
+    base, expected_base_hash = get_base_world_data(base_filename)
+    assert base_hash == expected_base_hash, "base scenario %r has changed: %s" % (base_filename, filename)
+    offset = DeltaHeader.size
+    tile_ids, offset = _read_tile_names(buf, offset, num_tile_names)
+    knapsack = numpy.frombuffer(buf, dtype=TILE_DTYPE, count=KNAPSACK_MAX, offset=offset)
+    offset += KNAPSACK_MAX
+    changed = numpy.frombuffer(buf, dtype=DeltaPlaceIdxDtype, count=num_changed, offset=offset)
+    offset += changed.nbytes
+    stacks = numpy.frombuffer(
+        buf, dtype=TILE_DTYPE, count=num_changed * PLACE_STACK_DEPTH, offset=offset).reshape((-1, PLACE_STACK_DEPTH))
+    _check_tile_ids(tile_ids, (knapsack, stacks), filename=filename)
+    tiles = numpy.array(base.tiles, dtype=TILE_DTYPE)
+    tiles.reshape((-1, PLACE_STACK_DEPTH))[changed] = tile_ids[stacks]
+    data = WorldData(tiles=tiles, has_game_state=bool(flags & BinaryFlagGameState))
+    data.knapsack = tile_ids[knapsack]
+    data.room_idx = room_idx
+    data.name = _decode_name(name)
+    data.scores = scores
+    data.lives = lives
+    data.diamonds_activated = [bool(d) for d in diamonds]
+    data.base_filename = base_filename
+    return data
+
+
+def write_delta_world_data(f, data):
+    """
+    :param typing.BinaryIO f: file opened for writing
+    :param WorldData data: with data.base_filename
+    """
+    assert data.base_filename, "a delta world file needs a base scenario"
+    base_filename = os.path.basename(data.base_filename)
+    base, base_hash = get_base_world_data(base_filename)
+    tiles = numpy.ascontiguousarray(data.tiles, dtype=TILE_DTYPE).reshape((-1, PLACE_STACK_DEPTH))
+    changed = numpy.flatnonzero((tiles != base.tiles.reshape((-1, PLACE_STACK_DEPTH))).any(axis=1))
+    stacks = tiles[changed]
+    used_tile_names = TILE_NAMES[:max(int(stacks.max(initial=0)), int(data.knapsack.max())) + 1]
+    header = DeltaHeader.pack(
+        DeltaMagic, DeltaVersion, BinaryFlagGameState if data.has_game_state else 0,
+        WORLD_WIDTH, WORLD_HEIGHT, ROOM_WIDTH, ROOM_HEIGHT, PLACE_STACK_DEPTH, KNAPSACK_MAX,
+        data.room_idx, len(DIAMOND_PICS),
+        data.scores, data.lives, *[int(d) for d in data.diamonds_activated],
+        _encode_name(data.name), _encode_name(base_filename), base_hash,
+        len(used_tile_names), len(changed))
+    f.write(header)
+    _write_tile_names(f, used_tile_names)
+    f.write(numpy.ascontiguousarray(data.knapsack, dtype=TILE_DTYPE).tobytes())
+    f.write(changed.astype(DeltaPlaceIdxDtype).tobytes())
+    f.write(stacks.tobytes())
+
+
+def main():
+    """
+    Converts between the world file formats, e.g. from .spi to .spb or .spd and back.
+    """
+    import argparse
+    arg_parser = argparse.ArgumentParser(description=main.__doc__)
+    arg_parser.add_argument("input")
+    arg_parser.add_argument("output")
+    arg_parser.add_argument("--base", help="base scenario for .%s output, e.g. robot.sce" % DeltaFileExt)
+    args = arg_parser.parse_args()
+    assert not os.path.exists(args.output), "output exists already: %s" % args.output
+    data = read_world_file(args.input)
+    if args.base:
+        data.base_filename = args.base
+    write_world_file(args.output, data)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,24 @@
 #!/usr/bin/env python3
 
-try:
-    # noinspection PyUnresolvedReferences
-    import arcade
-    # noinspection PyUnresolvedReferences
-    import better_exchook
-except ImportError:
-    print("See requirements.txt or README.md about what you need to install.")
-    print("Usually: pip3 install --user -r requirements.txt")
-    print()
-    raise
-
-
-from game.app import main
+# Only import what is needed for the startup profile here, see game/startup.py.
+# Everything else (arcade, pyglet, numpy) is imported below, in the measured phases.
+from game import startup
 
 
 if __name__ == "__main__":
+    startup.init()
+    with startup.phase("import arcade, better_exchook"):
+        try:
+            # noinspection PyUnresolvedReferences
+            import arcade
+            # noinspection PyUnresolvedReferences
+            import better_exchook
+        except ImportError:
+            print("See requirements.txt or README.md about what you need to install.")
+            print("Usually: pip3 install --user -r requirements.txt")
+            print()
+            raise
+    with startup.phase("import game.app"):
+        from game.app import main
     better_exchook.install()
     main()
@@ -0,0 +1,6 @@
+
+import os
+import sys
+
+# Such that "import game" works also when pytest is not started from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
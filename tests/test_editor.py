@@ -0,0 +1,109 @@
+
+"""
+Tests for the level editor history (game/editor.py). Headless, i.e. this only needs the Simulation.
+"""
+
+import numpy
+from game.world import Simulation, RoomObserver, SOFT_WALL_PIC, get_tile_id
+from game.editor import EditHistory
+
+
+def _load(filename="part1.spi"):
+    """
+    :param str filename:
+    :rtype: (Simulation, EditHistory)
+    """
+    game = Simulation()
+    game.load(filename)
+    return game, EditHistory(world=game.world)
+
+
+def _get_player_state(player):
+    """
+    :param game.world.Entity player:
+    :rtype: (int, int, bytes)
+    """
+    return player.scores, player.lives, player.knapsack.tiles.tobytes()
+
+
+class _CountingObserver(RoomObserver):
+    def __init__(self):
+        self.num_place_changed = 0
+        self.num_room_reset = 0
+
+    def on_place_changed(self, place):
+        self.num_place_changed += 1
+
+    def on_room_reset(self, room):
+        self.num_room_reset += 1
+
+
+def test_fill_notifies_observers_once():
+    game, history = _load()
+    room = [room for room in game.world.rooms if room is not game.world.find_human_player().room][0]
+    room.materialize()
+    history.fill_region(room, (0, 0), (room.width - 1, room.height - 1), [])
+    observer = _CountingObserver()
+    room.observers.append(observer)
+    wall = get_tile_id(SOFT_WALL_PIC)
+    assert history.fill_region(room, (0, 0), (room.width - 1, room.height - 1), [wall]) == room.width * room.height
+    assert (observer.num_place_changed, observer.num_room_reset) == (0, 1)
+    history.undo()
+    assert (observer.num_place_changed, observer.num_room_reset) == (0, 2)
+    assert len(room.entities_by_name.get(SOFT_WALL_PIC, ())) == 0
+
+
+def test_fill_keeps_player_state():
+    game, history = _load()
+    player = game.world.find_human_player()
+    state = _get_player_state(player)
+    assert state[0] > 0 and numpy.count_nonzero(player.knapsack.tiles) > 0
+    room = player.room
+    x, y = player.room_coord.tolist()
+    far = ((x + room.width // 2) % room.width, (y + room.height // 2) % room.height)
+    assert history.fill_region(room, far, far, []) + history.fill_region(room, far, far, [1]) > 0
+    assert game.world.find_human_player() is player
+    assert _get_player_state(player) == state
+
+
+def test_mirror_carries_player_state():
+    game, history = _load()
+    player = game.world.find_human_player()
+    state = _get_player_state(player)
+    room = player.room
+    assert history.mirror_region(room, (0, 0), (room.width - 1, room.height - 1), horizontal=True) > 0
+    new_player = game.world.find_human_player()
+    assert _get_player_state(new_player) == state
+
+
+def test_undo_redo_fill_keeps_player_state():
+    game, history = _load()
+    player = game.world.find_human_player()
+    state = _get_player_state(player)
+    room = player.room
+    tiles = room.tiles.copy()
+    assert history.fill_region(room, (0, 0), (room.width - 1, 0), [1]) > 0
+    history.undo()
+    assert numpy.array_equal(room.tiles, tiles)
+    history.redo()
+    history.undo()
+    assert game.world.find_human_player() is player
+    assert _get_player_state(player) == state
+
+
+def test_undo_reset_world():
+    game, history = _load("robot.sce")
+    assert game.world.find_king()
+    game.world.diamonds_activated[:] = [True] * len(game.world.diamonds_activated)
+    game.world.set_king_vulnerable()
+    player = game.world.find_human_player()
+    player.scores = 42
+    tiles = game.world.tiles.copy()
+    history.reset_world()
+    assert not game.world.tiles.any() and not any(game.world.diamonds_activated)
+    assert game.human_player is None
+    history.undo()
+    assert numpy.array_equal(game.world.tiles, tiles)
+    assert all(game.world.diamonds_activated)
+    assert game.world.find_human_player().scores == 42
+    assert game.world.find_king().lives == 0
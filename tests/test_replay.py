@@ -0,0 +1,25 @@
+
+"""
+The bundled recordings as end-to-end regression tests of the game logic (game/replay.py).
+"""
+
+import os
+import glob
+import pytest
+from game.replay import Recording, replay
+
+
+RecordingFiles = sorted(glob.glob(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + "/benchmarks/recordings/*.rec"))
+
+
+def test_have_recordings():
+    assert RecordingFiles
+
+
+@pytest.mark.parametrize("filename", RecordingFiles, ids=os.path.basename)
+def test_replay_recording(filename):
+    recording = Recording.load(filename)
+    sim, _ = replay(recording)
+    assert sim.ticks == recording.header["ticks"]
+    assert sim.get_state_hash() == recording.header["state_hash"]
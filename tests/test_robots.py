@@ -0,0 +1,94 @@
+
+"""
+Tests for the batched robot logic (game/robots.py).
+"""
+
+import os
+import glob
+import random
+import hashlib
+import pytest
+from game.world import Simulation, Entity, GAME_DATA_DIR, HARD_WALL_PIC
+from game.robots import get_robot_passability
+from game.worldfile import read_world_file
+
+
+DataFiles = sorted(glob.glob(GAME_DATA_DIR + "/*.s??"))
+HumanDirs = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+
+def _get_state(sim):
+    """
+    :param Simulation sim:
+    :return: hash of the tiles, and of all entities of the materialized rooms
+    :rtype: str
+    """
+    h = hashlib.sha1(sim.world.tiles.tobytes())
+    for room in sim.world.rooms:
+        if room.is_materialized():
+            for place in room.places:
+                h.update(repr([
+                    (entity.name, entity.lives, entity.is_alive, tuple(entity.room_coord.tolist()))
+                    for entity in place.entities]).encode())
+    return h.hexdigest()
+
+
+def _run(data, room_idx, batch, num_ticks=60):
+    """
+    :param worldfile.WorldData data:
+    :param int room_idx: the room to simulate
+    :param bool batch: Simulation.BatchRobotActions
+    :param int num_ticks:
+    :return: state after every tick
+    :rtype: list[str]
+    """
+    random.seed(room_idx)  # the same random numbers for both variants
+    sim = Simulation()
+    sim.BatchRobotActions = batch
+    sim.world.set_data(data)
+    sim._load_post_init()
+    sim.cur_room = sim.world.rooms[room_idx]
+    states = []
+    for tick in range(num_ticks):
+        human = sim.human_player
+        if tick % 3 == 0 and human.is_alive and human.room is sim.cur_room:
+            human.move(HumanDirs[tick % len(HumanDirs)])
+        sim.do_computer_interval()
+        states.append(_get_state(sim))
+    return states
+
+
+@pytest.mark.parametrize("compatibility1999", [True, False])
+@pytest.mark.parametrize("filename", DataFiles, ids=os.path.basename)
+def test_batch_robot_actions_are_same_as_single(filename, compatibility1999, monkeypatch):
+    monkeypatch.setattr(Simulation, "Compatibility1999", compatibility1999)
+    data = read_world_file(filename)
+    sim = Simulation()
+    sim.world.set_data(data)
+    sim._load_post_init()
+    if not sim.human_player:
+        pytest.skip("no player")
+    room_idxs = [room.idx for room in sim.world.rooms if room.find_robots()]
+    assert room_idxs
+    for room_idx in room_idxs[:3]:
+        assert _run(data, room_idx, batch=True) == _run(data, room_idx, batch=False), "room %i" % room_idx
+
+
+def test_distance_field_is_updated_when_terrain_changes():
+    sim = Simulation()
+    sim.world.set_data(read_world_file(GAME_DATA_DIR + "/robot.sce"))
+    sim._load_post_init()
+    room = sim.cur_room
+    passability = get_robot_passability(room)
+    human_x, human_y = sim.human_player.room_coord.tolist()
+    target_idx = human_y * room.width + human_x
+    dist = passability.get_distance_field(target_idx)
+    assert passability.get_distance_field(target_idx) is dist  # cached
+    unreachable = len(dist)
+    place_idx = [idx for idx in range(len(dist)) if dist[idx] == 1][0]
+    place = room.places[place_idx]
+    place.set_entity(Entity(room=room, room_coord=place.coord, name=HARD_WALL_PIC))
+    new_dist = passability.get_distance_field(target_idx)
+    assert new_dist is not dist
+    assert new_dist[place_idx] == unreachable
+    assert dist[place_idx] == 1
@@ -0,0 +1,38 @@
+
+"""
+Tests for the SQLite save store (game/savestore.py).
+"""
+
+from game.world import Simulation
+from game.savestore import SaveStore
+
+
+def test_background_save_into_store(tmp_path):
+    game = Simulation()
+    game.load("part1.spi")
+    game.save_store = SaveStore(str(tmp_path / "saves.sqlite"))
+    results = []
+    game.save_to_store("mysave", callback=lambda name, error: results.append((name, error)))
+    assert game.get_pending_store_saves() <= {"mysave"}
+    game.wait_for_saves()
+    assert results == [("mysave", None)]
+    assert not game.get_pending_saves() and not game.get_pending_store_saves()
+    info = game.get_save_store().get_info("mysave")
+    assert info and info.scores == game.human_player.scores
+    assert game.get_save_store().get_unique_name("mysave") == "mysave_1"
+    assert game.get_save_store().get_unique_name("other", taken={"other"}) == "other_1"
+
+
+def test_list_search_by_prefix():
+    game = Simulation()
+    game.load("part1.spi")
+    data = game.world.get_data(with_game_state=True)
+    store = SaveStore(":memory:")
+    for name in ["game", "game_1", "gamer", "my game", "Game", "ga%"]:
+        store.put(data, name=name)
+    assert sorted(info.name for info in store.list(search="game")) == ["game", "game_1", "gamer"]
+    assert [info.name for info in store.list(search="ga%")] == ["ga%"]
+    assert len(store.list()) == 6
+    plan = " ".join(str(row) for row in store.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM saves WHERE name >= ? AND name < ?", ("a", "b")))
+    assert "USING INDEX" in plan or "USING COVERING INDEX" in plan
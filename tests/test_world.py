@@ -0,0 +1,16 @@
+
+"""
+Tests for the headless simulation (game/world.py).
+"""
+
+from game.world import Simulation
+
+
+def test_free_place_heap_is_bounded():
+    game = Simulation()
+    game.load("robot.sce")
+    for _ in range(500):
+        game.do_computer_interval()
+    for room in game.world.rooms:
+        assert len(room.free_place_idxs_heap) <= room.width * room.height
+        assert len(set(room.free_place_idxs_heap)) == len(room.free_place_idxs_heap)
@@ -0,0 +1,81 @@
+"""
+Tests for the world file formats (game/worldfile.py).
+"""
+
+import os
+import glob
+import numpy
+import pytest
+from game import worldfile
+from game.world import TILE_NAMES, GAME_DATA_DIR, find_game_file
+
+
+DataFiles = sorted(glob.glob(GAME_DATA_DIR + "/*.s??"))
+
+
+def _assert_same_world_data(data1, data2):
+    """
+    :param worldfile.WorldData data1:
+    :param worldfile.WorldData data2:
+    """
+    assert numpy.array_equal(data1.tiles, data2.tiles)
+    assert numpy.array_equal(data1.knapsack, data2.knapsack)
+    assert (data1.has_game_state, data1.room_idx, data1.scores, data1.lives, data1.diamonds_activated) == (
+        data2.has_game_state, data2.room_idx, data2.scores, data2.lives, data2.diamonds_activated)
+
+
+@pytest.mark.parametrize("filename", DataFiles, ids=os.path.basename)
+def test_binary_round_trip(filename, tmp_path):
+    data = worldfile.read_world_file(filename)
+    worldfile.write_world_file(str(tmp_path / "world.spb"), data)
+    binary_data = worldfile.read_world_file(str(tmp_path / "world.spb"))
+    _assert_same_world_data(data, binary_data)
+    legacy_filename = str(tmp_path / os.path.basename(filename))
+    worldfile.write_world_file(legacy_filename, binary_data)
+    _assert_same_world_data(data, worldfile.read_world_file(legacy_filename))
+
+
+def test_binary_long_name_is_truncated_on_character_boundary(tmp_path):
+    data = worldfile.read_world_file(find_game_file("robot.sce"))
+    data.name = "ä" * 40  # 80 bytes in UTF-8
+    worldfile.write_world_file(str(tmp_path / "world.spb"), data)
+    data = worldfile.read_world_file(str(tmp_path / "world.spb"))
+    assert data.name == "ä" * (worldfile.BinaryNameSize // 2)
+
+
+def test_binary_invalid_tile_id_is_rejected(tmp_path):
+    filename = str(tmp_path / "world.spb")
+    worldfile.write_world_file(filename, worldfile.read_world_file(find_game_file("robot.sce")))
+    with open(filename, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\xff")  # last tile of the last place
+    with pytest.raises(AssertionError, match="invalid tile id"):
+        worldfile.read_world_file(filename)
+
+
+def test_content_hash_is_independent_of_tile_ids(monkeypatch):
+    data = worldfile.read_world_file(find_game_file("robot.sce"))
+    content_hash = worldfile.get_world_content_hash(data)
+    # The same world, but with the tile ids assigned in another order, e.g. after other files were loaded.
+    perm = numpy.array([0] + list(range(len(TILE_NAMES) - 1, 0, -1)))
+    permuted_names = [""] * len(TILE_NAMES)
+    for tile_id, name in enumerate(TILE_NAMES):
+        permuted_names[perm[tile_id]] = name
+    data.tiles = perm[data.tiles].astype(data.tiles.dtype)
+    monkeypatch.setattr(worldfile, "TILE_NAMES", permuted_names)
+    assert worldfile.get_world_content_hash(data) == content_hash
+
+
+@pytest.mark.parametrize("filename", DataFiles, ids=os.path.basename)
+def test_delta_round_trip(filename, tmp_path):
+    data = worldfile.read_world_file(filename)
+    data.base_filename = "robot.sce"
+    worldfile.write_world_file(str(tmp_path / "world.spd"), data)
+    delta_data = worldfile.read_world_file(str(tmp_path / "world.spd"))
+    _assert_same_world_data(data, delta_data)
+    assert delta_data.base_filename == "robot.sce"
+    worldfile.write_world_file(str(tmp_path / "world.spb"), delta_data)
+    binary_data = worldfile.read_world_file(str(tmp_path / "world.spb"))
+    binary_data.base_filename = "robot.sce"
+    worldfile.write_world_file(str(tmp_path / "world2.spd"), binary_data)
+    _assert_same_world_data(data, worldfile.read_world_file(str(tmp_path / "world2.spd")))